@@ -0,0 +1,124 @@
+### chap11/bfs.py -- Breadth-first searches over a maze's move table
+from collections import deque
+import maze
+
+# These searches read only the maze's move table, leaving its contents
+# untouched, so many of them can run over one map at the same time.
+# They used to live in router.py, but distmap, ch, and searchtrace only
+# want a search, not an asyncio service and a process pool.
+
+def _goal_cells(my_map, goals, adjacent):
+    # Returns goal_of, where goal_of[cid] is the cell id of the goal we
+    # reach by reaching cell cid, or -1.  If adjacent is true, a goal
+    # that no move can enter, like a pin inside a building, is reached
+    # from any of its neighbors that has a way out.
+    moves = my_map.moves
+    h2 = my_map.height + 2
+    n = len(my_map.locs)
+    goal_of = [-1] * n
+    walled = []
+    for g in goals:
+        gid = my_map.cell_id(g)
+        goal_of[gid] = gid
+        if not adjacent:
+            continue
+        x, y = g
+        nbrs = [(code, nid) for code, nid in
+                ((maze.SOUTH, gid + 1 if y + 1 < h2 else -1),
+                 (maze.NORTH, gid - 1 if y > 0 else -1),
+                 (maze.WEST, gid + h2), (maze.EAST, gid - h2))
+                if 0 <= nid < n]
+        if all(moves[nid * 4 + code] != gid for code, nid in nbrs):
+            walled.append((gid, nbrs))
+    for gid, nbrs in walled:
+        for _, nid in nbrs:
+            if goal_of[nid] == -1 and \
+               any(moves[nid * 4 + code] != nid for code in range(4)):
+                goal_of[nid] = gid
+    return goal_of
+
+def nearest_goal(my_map, start, goals, trace=None, adjacent=False):
+    """Breadth-first search from start that stops at the first of the
+       locations in `goals` it reaches.  Returns that goal and the list
+       of actions ('n', 'e', 's', 'w') along a shortest path to it, or
+       (None, None) if no goal is reachable.  A single search costs the
+       same no matter how many goals there are.
+
+       If adjacent is true, a goal walled off on every side, such as a
+       pin inside a building, counts as reached at any open cell beside
+       it: the goal returned is still the one given, but the actions
+       end next to it.  If trace (a searchtrace.SearchTrace) is given,
+       the search records itself in it."""
+    start_id = my_map.cell_id(start)
+    goal_of = _goal_cells(my_map, goals, adjacent)
+    moves = my_map.moves
+
+    # parent[cid] is the cell id we came from, and action[cid] is the
+    # direction code that got us there.  -1 means unexplored.
+    parent = [-1] * len(my_map.locs)
+    action = [-1] * len(my_map.locs)
+    parent[start_id] = start_id
+
+    # A trace costs one append per cell we expand; see searchtrace.py
+    log = trace.events.append if trace is not None else None
+
+    frontier = deque([start_id])
+    while frontier:
+        cid = frontier.popleft()
+        if log:
+            log(cid)
+        if goal_of[cid] != -1:
+            break
+        for code in range(4):
+            nid = moves[cid * 4 + code]
+            if parent[nid] == -1:
+                parent[nid] = cid
+                action[nid] = code
+                frontier.append(nid)
+    else:
+        if trace is not None:
+            trace.finish(parent)
+        return None, None
+    if trace is not None:
+        trace.finish(parent, cid)
+
+    # Follow the parent links back to the start
+    goal_id = goal_of[cid]
+    actions = []
+    while cid != start_id:
+        actions.append(maze.DIRECTIONS[action[cid]])
+        cid = parent[cid]
+    actions.reverse()
+    return my_map.locs[goal_id], actions
+
+def shortest_path(my_map, start, goal):
+    """Breadth-first search from start to goal.  Returns the list of
+       actions ('n', 'e', 's', 'w') along a shortest path that ends at
+       goal, or None if there isn't one."""
+    return nearest_goal(my_map, start, (goal,))[1]
+
+def exits(my_map):
+    """Returns every border location of my_map except the corners,
+       for use as the goals of nearest_goal"""
+    w, h = my_map.width, my_map.height
+    return ([(x, 0) for x in range(1, w + 1)] +
+            [(x, h + 1) for x in range(1, w + 1)] +
+            [(0, y) for y in range(1, h + 1)] +
+            [(w + 1, y) for y in range(1, h + 1)])
+
+
+def main():
+    # Just a testing routine
+    from city import CitySqGrid
+
+    nyc = CitySqGrid(6)
+    pins = [(3, 11), (7, 9), (9, 1)]    # all inside buildings
+    print(f'Pins, strictly: {nearest_goal(nyc, nyc.start, pins)}')
+    goal, actions = nearest_goal(nyc, nyc.start, pins, adjacent=True)
+    print(f'Pins, from beside them: {goal} by {actions}')
+    print(f'To (1,1): {shortest_path(nyc, nyc.start, (1, 1))}')
+    goal, actions = nearest_goal(nyc, nyc.start, exits(nyc))
+    print(f'Nearest exit: {goal} by {actions}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+### chap11/ch.py -- Contraction hierarchies for fast repeated routing
+import sys
+import heapq
+import pickle
+import hashlib
+from array import array
+
+# When a map's walls never change, we can do most of the work of
+# routing ahead of time.  A contraction hierarchy ranks every cell and
+# then removes ("contracts") the cells one at a time, from lowest rank
+# to highest.  Whenever removing a cell v would lengthen the shortest
+# path from one of its neighbors u to another neighbor w, we add a
+# shortcut edge u->w that remembers v as its middle cell.  Afterwards,
+# every shortest path can be found by searching only "upward" edges
+# (toward higher-ranked cells) forward from the start and backward from
+# the goal, which visits a tiny part of the map.
+#
+# Edges are directed, so one-way streets (mismatched walls) work.  Every
+# original move costs 1, and a shortcut costs the sum of its two halves.
+
+FORMAT = 2
+INFINITY = float('inf')
+
+class ContractionHierarchy(object):
+    """Abstraction: A ContractionHierarchy answers shortest-route queries
+       on a fixed maze.  Build one with build(my_map), or load one saved
+       earlier with load(path, my_map).
+
+       route(start, goal): Returns the list of actions ('n', 'e', 's',
+       'w') along a shortest route from start to goal, or None if there
+       isn't one.  Same answers (up to ties) as bfs.shortest_path.
+
+       distance(start, goal): Returns the length of that route, or
+       None.
+
+       save(path): Writes the hierarchy to a file.
+
+       matches(my_map): True if my_map has the walls this hierarchy was
+       built from.  Any wall edit since then makes its routes wrong.
+    """
+    # Implementation details: Cells are identified by their Maze cell
+    # ids.  The upward edges are stored in compressed sparse row form:
+    # the edges out of cell a in the forward graph are fwd_to[i],
+    # fwd_cost[i], and fwd_mid[i] for fwd_first[a] <= i < fwd_first[a+1].
+    # The backward graph holds, for each cell b, the edges a->b that
+    # come down into b from a higher-ranked a.  A mid of -1 marks an
+    # original move rather than a shortcut.  The digest is a SHA-256 of
+    # the maze's wall masks (see Maze.wall_masks).
+
+    def __init__(self, width, height, digest, rank, fwd, bwd):
+        self.width = width
+        self.height = height
+        self.digest = digest
+        self.rank = rank
+        self.fwd_first, self.fwd_to, self.fwd_cost, self.fwd_mid = fwd
+        self.bwd_first, self.bwd_to, self.bwd_cost, self.bwd_mid = bwd
+
+    def __cell_id(self, location):
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        return x * (self.height + 2) + y
+
+    def __search(self, s, t):
+        # Hidden helper: bidirectional upward Dijkstra.  Returns the
+        # best distance, the meeting cell, and both parent maps.
+        dist = ({s: 0}, {t: 0})
+        parent = ({s: None}, {t: None})
+        heaps = ([(0, s)], [(0, t)])
+        graphs = ((self.fwd_first, self.fwd_to, self.fwd_cost),
+                  (self.bwd_first, self.bwd_to, self.bwd_cost))
+        best, meet = INFINITY, -1
+        if s == t:
+            return 0, s, parent
+
+        side = 0
+        while heaps[0] or heaps[1]:
+            # Alternate directions, skipping one that has run dry
+            if not heaps[side]:
+                side = 1 - side
+            d, x = heapq.heappop(heaps[side])
+            if d >= best:
+                heaps[side].clear()    # nothing better this way
+                side = 1 - side
+                continue
+            my_dist, other_dist = dist[side], dist[1 - side]
+            if d > my_dist[x]:
+                side = 1 - side
+                continue
+            if x in other_dist and d + other_dist[x] < best:
+                best, meet = d + other_dist[x], x
+
+            first, to, cost = graphs[side]
+            for i in range(first[x], first[x + 1]):
+                y = to[i]
+                nd = d + cost[i]
+                if nd < my_dist.get(y, INFINITY):
+                    my_dist[y] = nd
+                    parent[side][y] = x
+                    heapq.heappush(heaps[side], (nd, y))
+                    if y in other_dist and nd + other_dist[y] < best:
+                        best, meet = nd + other_dist[y], y
+            side = 1 - side
+        return best, meet, parent
+
+    def __mid(self, a, b):
+        # Hidden helper: the middle cell of the edge a->b, or -1
+        if self.rank[b] > self.rank[a]:
+            for i in range(self.fwd_first[a], self.fwd_first[a + 1]):
+                if self.fwd_to[i] == b:
+                    return self.fwd_mid[i]
+        else:
+            for i in range(self.bwd_first[b], self.bwd_first[b + 1]):
+                if self.bwd_to[i] == a:
+                    return self.bwd_mid[i]
+        raise KeyError(f'no edge {a}->{b}')
+
+    def distance(self, start, goal):
+        best, _, _ = self.__search(self.__cell_id(start),
+                                   self.__cell_id(goal))
+        return None if best == INFINITY else best
+
+    def route(self, start, goal):
+        s, t = self.__cell_id(start), self.__cell_id(goal)
+        best, meet, parent = self.__search(s, t)
+        if best == INFINITY:
+            return None
+
+        # Cells of the upward path: s ... meet ... t
+        path = []
+        x = meet
+        while x is not None:
+            path.append(x)
+            x = parent[0][x]
+        path.reverse()
+        x = parent[1][meet]
+        while x is not None:
+            path.append(x)
+            x = parent[1][x]
+
+        # Unpack the shortcuts into original moves
+        h2 = self.height + 2
+        step = {1: 'n', h2: 'e', -1: 's', -h2: 'w'}
+        actions = []
+        for a, b in zip(path, path[1:]):
+            todo = [(a, b)]
+            while todo:
+                u, w = todo.pop()
+                m = self.__mid(u, w)
+                if m == -1:
+                    actions.append(step[w - u])
+                else:
+                    todo.append((m, w))    # popped second
+                    todo.append((u, m))    # popped first
+        return actions
+
+    def matches(self, my_map):
+        return (my_map.width, my_map.height) == (self.width, self.height) \
+               and _digest(my_map) == self.digest
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump((FORMAT, self.width, self.height, self.digest,
+                         self.rank,
+                         (self.fwd_first, self.fwd_to, self.fwd_cost,
+                          self.fwd_mid),
+                         (self.bwd_first, self.bwd_to, self.bwd_cost,
+                          self.bwd_mid)),
+                        f, pickle.HIGHEST_PROTOCOL)
+
+
+def load(path, my_map):
+    """Returns the ContractionHierarchy saved in the file at path, after
+       checking that it was built from my_map's walls.  Raises
+       ValueError if it wasn't."""
+    with open(path, 'rb') as f:
+        fmt, *fields = pickle.load(f)
+    if fmt != FORMAT:
+        raise ValueError(f'{path} has unknown format {fmt}')
+    hierarchy = ContractionHierarchy(*fields)
+    if not hierarchy.matches(my_map):
+        raise ValueError(f'{path} was built for a different maze')
+    return hierarchy
+
+def _digest(my_map):
+    return hashlib.sha256(my_map.wall_masks()).hexdigest()
+
+
+def _witness(out_e, contracted, source, skip, limit, max_settled=64):
+    # Dijkstra from source over uncontracted cells other than skip,
+    # giving up past distance limit or after max_settled cells
+    dist = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap:
+        d, x = heapq.heappop(heap)
+        if d > dist[x]:
+            continue
+        if d > limit or settled >= max_settled:
+            break
+        settled += 1
+        for y, (c, _) in out_e[x].items():
+            if y == skip or contracted[y]:
+                continue
+            nd = d + c
+            if nd < dist.get(y, INFINITY):
+                dist[y] = nd
+                heapq.heappush(heap, (nd, y))
+    return dist
+
+def _shortcuts(out_e, in_e, contracted, v):
+    # The shortcuts needed to contract v, as (u, w, cost) triples
+    ins = [(u, c) for u, (c, _) in in_e[v].items() if not contracted[u]]
+    outs = [(w, c) for w, (c, _) in out_e[v].items() if not contracted[w]]
+    if not ins or not outs:
+        return []
+    max_out = max(c for _, c in outs)
+    needed = []
+    for u, cu in ins:
+        dist = _witness(out_e, contracted, u, v, cu + max_out)
+        for w, cw in outs:
+            if w != u and dist.get(w, INFINITY) > cu + cw:
+                needed.append((u, w, cu + cw))
+    return needed
+
+def build(my_map):
+    """Preprocesses the Maze my_map and returns its hierarchy"""
+    n = len(my_map.locs)
+
+    # The directed graph of moves: out_e[a][b] = in_e[b][a] = (cost, mid)
+    out_e = [{} for _ in range(n)]
+    in_e = [{} for _ in range(n)]
+    for a in range(n):
+        for code in range(4):
+            b = my_map.move_id(a, code)
+            if b != a:
+                out_e[a][b] = (1, -1)
+                in_e[b][a] = (1, -1)
+
+    contracted = bytearray(n)
+    deleted_nbrs = [0] * n
+    rank = array('i', [0] * n)
+
+    def priority(v):
+        # Edge difference plus a term that spreads contraction evenly
+        degree = sum(1 for u in in_e[v] if not contracted[u]) + \
+                 sum(1 for w in out_e[v] if not contracted[w])
+        return len(_shortcuts(out_e, in_e, contracted, v)) - degree + \
+               deleted_nbrs[v]
+
+    heap = [(priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+    next_rank = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # Lazy update: if v's priority has grown, put it back
+        p = priority(v)
+        if heap and p > heap[0][0]:
+            heapq.heappush(heap, (p, v))
+            continue
+
+        for u, w, c in _shortcuts(out_e, in_e, contracted, v):
+            if c < out_e[u].get(w, (INFINITY, -1))[0]:
+                out_e[u][w] = (c, v)
+                in_e[w][u] = (c, v)
+        contracted[v] = 1
+        rank[v] = next_rank
+        next_rank += 1
+        for u in in_e[v]:
+            deleted_nbrs[u] += 1
+        for w in out_e[v]:
+            deleted_nbrs[w] += 1
+
+    # Split every edge into the upward forward and backward graphs
+    fwd = [[] for _ in range(n)]
+    bwd = [[] for _ in range(n)]
+    for a in range(n):
+        for b, (c, mid) in out_e[a].items():
+            if rank[b] > rank[a]:
+                fwd[a].append((b, c, mid))
+            else:
+                bwd[b].append((a, c, mid))
+
+    def csr(lists):
+        first, to, cost, mid = array('i', [0]), array('i'), \
+                               array('i'), array('i')
+        for edges in lists:
+            for e in edges:
+                to.append(e[0])
+                cost.append(e[1])
+                mid.append(e[2])
+            first.append(len(to))
+        return first, to, cost, mid
+
+    return ContractionHierarchy(my_map.width, my_map.height,
+                                _digest(my_map), rank, csr(fwd), csr(bwd))
+
+
+def main():
+    # Just a testing routine: compare against plain BFS
+    import time
+    import random
+    import mazegen
+    import bfs
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    my_map = mazegen.city(size, size, seed=32)
+
+    t = time.perf_counter()
+    hierarchy = build(my_map)
+    print(f'Built a hierarchy for a {size}x{size} city in '
+          f'{time.perf_counter() - t:.2f}s')
+
+    rng = random.Random(32)
+    cells = [loc for cid, loc in enumerate(my_map.locs)
+             if any(my_map.move_id(cid, code) != cid for code in range(4))]
+    queries = [(rng.choice(cells), rng.choice(cells)) for _ in range(200)]
+
+    t = time.perf_counter()
+    ch_routes = [hierarchy.route(s, g) for s, g in queries]
+    ch_time = time.perf_counter() - t
+    t = time.perf_counter()
+    bfs_routes = [bfs.shortest_path(my_map, s, g) for s, g in queries]
+    bfs_time = time.perf_counter() - t
+
+    for (s, g), a, b in zip(queries, ch_routes, bfs_routes):
+        assert (a is None) == (b is None), f'{s} -> {g}'
+        if a is not None:
+            assert len(a) == len(b), f'{s} -> {g}: {len(a)} != {len(b)}'
+            loc = s
+            for step in a:
+                loc = my_map.simulate_move(loc, step)
+            assert loc == g, f'{s} -> {g} ends at {loc}'
+    print(f'{len(queries)} queries agree with BFS; '
+          f'{1e3 * ch_time / len(queries):.3f} ms per query vs '
+          f'{1e3 * bfs_time / len(queries):.3f} ms')
+
+    # A saved hierarchy loads only for the maze it was built from
+    import os
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'city.ch')
+    hierarchy.save(path)
+    assert load(path, my_map).route(*queries[0]) == ch_routes[0]
+    x, y = my_map.start
+    my_map.close_street((x, y), (x + 1, y))
+    try:
+        load(path, my_map)
+        assert False, 'loaded a hierarchy for an edited maze'
+    except ValueError as e:
+        print(f'After a wall edit: {e}')
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+### chap11/crowd.py -- Many dogs walking one city at the same time
+import sys
+import random
+from array import array
+from collections import deque
+
+# `dogwalk` moves one walker through the city with Maze.move, which
+# writes the walker into the cells' contents.  To model foot traffic,
+# we instead keep every walker's state in our own arrays and leave the
+# map alone, reading only its move table.
+#
+# Each walker takes a self-avoiding random walk like `dogwalk`'s.  Time
+# advances in ticks.  In each tick, the walkers that are still in the
+# city move once each, in a freshly shuffled order so that no walker is
+# always first to claim a cell.  A cell inside the city holds at most
+# `capacity` walkers, so a walker picks among the unexplored neighbors
+# that have room, and waits where it is if they are all full.  A walker
+# with no unexplored neighbors is stuck and leaves the simulation, as
+# does a walker that reaches the border.  Walkers that haven't entered
+# yet queue at their start cell until there is room.  If a whole tick
+# passes in which nobody moves, enters, or leaves, the remaining
+# walkers are gridlocked and nothing will ever change again.
+#
+# For the congestion report, a street segment is a maximal run of
+# connected cells that each have one or two neighbors.  Cells with
+# three or more neighbors are intersections and belong to no segment.
+
+QUEUED, WALKING, ESCAPED, STUCK = range(4)
+
+def street_segments(my_map):
+    """Returns (seg_of, segments) for my_map.  seg_of[cid] is the index
+       of the street segment holding cell cid, or -1 if it is in none,
+       and segments[i] lists the cell ids of segment i."""
+    n = len(my_map.locs)
+    nbrs = [set() for _ in range(n)]
+    for cid in range(n):
+        for code in range(4):
+            other = my_map.move_id(cid, code)
+            if other != cid:
+                nbrs[cid].add(other)
+                nbrs[other].add(cid)
+
+    seg_of = array('i', [-1] * n)
+    segments = []
+    is_street = [my_map.locs[c] in my_map and 1 <= len(nbrs[c]) <= 2
+                 for c in range(n)]
+    for cid in range(n):
+        if not is_street[cid] or seg_of[cid] != -1:
+            continue
+        seg = len(segments)
+        seg_of[cid] = seg
+        cells = [cid]
+        todo = deque([cid])
+        while todo:
+            for other in nbrs[todo.popleft()]:
+                if is_street[other] and seg_of[other] == -1:
+                    seg_of[other] = seg
+                    cells.append(other)
+                    todo.append(other)
+        segments.append(sorted(cells))
+    return seg_of, segments
+
+
+class Crowd(object):
+    """Abstraction: A Crowd is a group of walkers sharing one map, which
+       is only read, never changed.
+
+       Crowd(my_map, walkers, starts=None, capacity=1, seed=None): Puts
+       `walkers` walkers in the queue at the map's start, or, if given,
+       at starts[i % len(starts)] for walker i.
+
+       instance.status: Per-walker bytearray of QUEUED, WALKING,
+       ESCAPED, or STUCK.
+
+       instance.[walking, escaped, stuck]: How many walkers are in each
+       state.  instance.ticks: How many ticks have run.
+
+       tick(): Advances every walker by one move, and returns the
+       number of walkers still walking or queued.
+
+       run(max_ticks=None): Ticks until every walker has left, the
+       walkers left are gridlocked, or max_ticks ticks have run.
+       Returns the number of ticks run.
+
+       instance.gridlocked: True if the last tick changed nothing.
+
+       congestion(top=None): Returns the busiest street segments, most
+       walker-ticks first, as (locations, walker_ticks, peak, waits)
+       tuples, where peak is the most walkers seen on the segment at
+       once and waits counts the times a walker was held up because
+       the segment's next cell was full.
+
+       mark(my_map): Marks each occupied cell of my_map with the number
+       of walkers in it.
+    """
+    # Implementation details: Walker i is at cell id pos[i] and has
+    # visited the cell ids in visited[i].  occupancy[cid] counts the
+    # walkers in cell cid.  The neighbor lists come from the map's move
+    # table, and the per-tick loop touches only those lists and our
+    # arrays.  If the map's walls are edited, we rebuild the lists at
+    # the start of the next tick; the street segments stay as they were
+    # at construction, so that the statistics keep adding up.
+
+    def __init__(self, my_map, walkers, starts=None, capacity=1, seed=None):
+        assert capacity >= 1, 'capacity must be at least 1'
+        self.my_map = my_map
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.ticks = 0
+        self.gridlocked = False
+
+        n = len(my_map.locs)
+        self.inside = bytearray(loc in my_map for loc in my_map.locs)
+        self.__build_neighbors()
+        self.seg_of, self.segments = street_segments(my_map)
+
+        if starts is None:
+            starts = [my_map.start]
+        start_ids = [my_map.cell_id(loc) for loc in starts]
+        self.pos = array('i', (start_ids[i % len(start_ids)]
+                               for i in range(walkers)))
+        self.steps = array('i', [0] * walkers)
+        self.status = bytearray(walkers)     # all QUEUED
+        self.visited = [set() for _ in range(walkers)]
+        self.occupancy = array('H', [0] * n)
+        self.queue = deque(range(walkers))
+        self.active = []
+        self.walking = self.escaped = self.stuck = 0
+
+        nsegs = len(self.segments)
+        self.seg_ticks = array('q', [0] * nsegs)
+        self.seg_peak = array('i', [0] * nsegs)
+        self.seg_waits = array('i', [0] * nsegs)
+
+    def __build_neighbors(self):
+        # Hidden helper: the distinct cells one move from each cell
+        my_map = self.my_map
+        self.version = my_map.version
+        self.nbrs = []
+        for cid in range(len(my_map.locs)):
+            moves = []
+            for code in range(4):
+                other = my_map.move_id(cid, code)
+                if other != cid and other not in moves:
+                    moves.append(other)
+            self.nbrs.append(tuple(moves))
+
+    def __has_room(self, cid):
+        return not self.inside[cid] or self.occupancy[cid] < self.capacity
+
+    def __leave(self, i, status):
+        # Hidden helper: walker i leaves the simulation
+        cid = self.pos[i]
+        if self.inside[cid]:
+            self.occupancy[cid] -= 1
+        self.status[i] = status
+        self.walking -= 1
+        if status == ESCAPED:
+            self.escaped += 1
+        else:
+            self.stuck += 1
+
+    def __enter(self):
+        # Hidden helper: admits queued walkers whose start has room, and
+        # returns how many it admitted.  Walkers queued behind a full
+        # start keep their place in line.
+        before = len(self.queue)
+        waiting = deque()
+        while self.queue:
+            i = self.queue.popleft()
+            cid = self.pos[i]
+            if not self.__has_room(cid):
+                waiting.append(i)
+                continue
+            self.status[i] = WALKING
+            self.walking += 1
+            if not self.inside[cid]:
+                self.__leave(i, ESCAPED)
+                continue
+            self.occupancy[cid] += 1
+            self.active.append(i)
+        self.queue = waiting
+        return before - len(waiting)
+
+    def tick(self):
+        changes = 0
+        if self.ticks == 0:
+            changes += self.__enter()
+        if self.version != self.my_map.version:
+            self.__build_neighbors()
+
+        pos, steps, nbrs, visited = self.pos, self.steps, self.nbrs, \
+                                    self.visited
+        inside, occupancy, capacity = self.inside, self.occupancy, \
+                                      self.capacity
+        seg_of, seg_waits = self.seg_of, self.seg_waits
+        rng = self.rng
+
+        rng.shuffle(self.active)
+        still = []
+        for i in self.active:
+            cid = pos[i]
+            seen = visited[i]
+            seen.add(cid)
+            choices = [c for c in nbrs[cid] if c not in seen]
+            if not choices:
+                self.__leave(i, STUCK)      # dead end!
+                changes += 1
+                continue
+            roomy = [c for c in choices
+                     if not inside[c] or occupancy[c] < capacity]
+            if not roomy:
+                for c in choices:
+                    if seg_of[c] != -1:
+                        seg_waits[seg_of[c]] += 1
+                still.append(i)             # wait for room
+                continue
+            nxt = roomy[int(rng.random() * len(roomy))]
+            changes += 1
+            steps[i] += 1
+            if inside[nxt]:
+                occupancy[cid] -= 1
+                occupancy[nxt] += 1
+                still.append(i)
+            else:
+                self.__leave(i, ESCAPED)    # frees cid
+            pos[i] = nxt
+        self.active = still
+        self.ticks += 1
+        changes += self.__enter()
+        self.gridlocked = changes == 0
+
+        # Congestion bookkeeping for this tick
+        load = {}
+        for i in still:
+            seg = seg_of[pos[i]]
+            if seg != -1:
+                load[seg] = load.get(seg, 0) + 1
+        for seg, count in load.items():
+            self.seg_ticks[seg] += count
+            if count > self.seg_peak[seg]:
+                self.seg_peak[seg] = count
+        return len(self.active) + len(self.queue)
+
+    def run(self, max_ticks=None):
+        start = self.ticks
+        while (self.ticks == 0 or self.active or self.queue) and \
+              not self.gridlocked and \
+              (max_ticks is None or self.ticks - start < max_ticks):
+            self.tick()
+        return self.ticks - start
+
+    def congestion(self, top=None):
+        locs = self.my_map.locs
+        order = sorted(range(len(self.segments)),
+                       key=lambda s: (-self.seg_ticks[s], s))
+        if top is not None:
+            order = order[:top]
+        return [([locs[c] for c in self.segments[s]], self.seg_ticks[s],
+                 self.seg_peak[s], self.seg_waits[s]) for s in order]
+
+    def mark(self, my_map):
+        for cid, count in enumerate(self.occupancy):
+            if count:
+                my_map.mark(my_map.locs[cid],
+                            str(count) if count < 10 else '+')
+
+
+def main():
+    # Just a testing routine
+    import time
+    from city import CitySqGrid
+
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python3 crowd.py blocks walkers [capacity]")
+    blocks = int(sys.argv[1])   # on a side of the square grid; try 10
+    walkers = int(sys.argv[2])  # try 2000
+    capacity = int(sys.argv[3]) if len(sys.argv) == 4 else 2
+
+    my_city = CitySqGrid(blocks)
+    crowd = Crowd(my_city, walkers, capacity=capacity, seed=11)
+
+    crowd.run(blocks)
+    print(f'After {crowd.ticks} ticks:')
+    my_city.reset()
+    crowd.mark(my_city)
+    print(my_city)
+
+    t = time.perf_counter()
+    crowd.run()
+    elapsed = time.perf_counter() - t
+    print(f'{walkers} walkers done after {crowd.ticks} ticks '
+          f'({elapsed:.2f}s): {crowd.escaped} escaped, {crowd.stuck} '
+          f'stuck' + (f', {crowd.walking} gridlocked'
+                      if crowd.gridlocked else ''))
+    print('Busiest street segments (walker-ticks, peak, waits):')
+    for cells, ticks, peak, waits in crowd.congestion(5):
+        print(f'  {cells[0]}-{cells[-1]}: {ticks}, {peak}, {waits}')
+
+if __name__ == '__main__':
+    main()
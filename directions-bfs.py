@@ -1,22 +1,25 @@
 ### chap11/directions-bfs.py
+import sys
 import maze
+import profiling
+import route
+import searchtrace
+from treenote import TreeNote
 
 # Marks for map, which use color codes for terminal printing
 EXPLORED = '\033[34m*\033[0m' # blue *
 FRONTIER = '\033[32mf\033[0m' # green f
 
-# Keep track of the tree of explored paths
-class TreeNote():
-    def __init__(self, state, parent, action):
-        self.state = state    # current location 
-        self.parent = parent  # previous note in path
-        self.action = action  # action that got us to this location
+def search(my_map, trace=None):
+    # Optionally keep each note we explore, for a searchtrace.SearchTrace
+    explored = []
 
-def search(my_map):
     # Set the current state and mark the map location explored
     cur_loc = my_map.start
     my_map.mark(cur_loc, EXPLORED)
     cur_note = TreeNote(cur_loc, None, None)
+    if trace is not None:
+        explored.append(cur_note)
 
     # Build a list on which to keep known but unexplored locations
     frontier = []
@@ -33,7 +36,8 @@ def search(my_map):
                 frontier.append(new_note)
                 my_map.mark(loc, FRONTIER)
 
-        # DEBUG: Uncomment to watch the frontier grow
+        # DEBUG: Uncomment to watch the frontier grow, or run with
+        # --trace=PATH and replay the search with searchtrace.py
         # print(my_map)
         # print(f'DEBUG: cur_loc = {cur_loc}; moves = {moves}')
         # print(f'DEBUG: frontier = {[note.state for note in frontier]}')
@@ -41,41 +45,71 @@ def search(my_map):
 
         if len(frontier) == 0:
             print('No solution')
+            if trace is not None:
+                finish_trace(my_map, trace, explored, frontier)
             return
 
         # Choose a note from the frontier as next to explore
         next_note = frontier.pop(0)
         next_loc = next_note.state
         my_map.mark(next_loc, EXPLORED)
+        if trace is not None:
+            explored.append(next_note)
 
         # Update current state
         cur_note = next_note
         cur_loc = next_loc
 
+    if trace is not None:
+        finish_trace(my_map, trace, explored, frontier)
+
     # Follow the parent links from cur_note to create
     # the actual driving directions
-    ddirections = [cur_note]
-    while cur_note.parent:  # while parent exists
-        cur_note = cur_note.parent
-        ddirections.insert(0, cur_note)
+    ddirections = route.from_note(cur_note)
 
     # Print out the driving directions
     print('## Solution ##')
-    print(f'Starting at {ddirections[0].state}')
-    ddirections.pop(0)
-    for n in ddirections:
-        print(f'Go {n.action} then')
+    print(f'Starting at {ddirections.start}')
+    for step in ddirections.instructions():
+        print(step)
     print('Arrive at your goal')
     return
 
 
+def finish_trace(my_map, trace, explored, frontier):
+    # Fills in trace from the notes we explored, in order, and the notes
+    # still on the frontier
+    parent = [-1] * len(my_map.locs)
+    for note in explored + frontier:
+        cid = my_map.cell_id(note.state)
+        if parent[cid] == -1:
+            parent[cid] = cid if note.parent is None else \
+                          my_map.cell_id(note.parent.state)
+    trace.events.extend(my_map.cell_id(note.state) for note in explored)
+    last = explored[-1].state
+    trace.finish(parent, my_map.cell_id(last) if last == my_map.goal else -1)
+
+
 def main():
+    prof = profiling.Profile(sys.argv)   # takes --profile[=PATH]
+    trace_path = None                    # and --trace=PATH
+    for arg in sys.argv[1:]:
+        if arg.startswith('--trace='):
+            trace_path = arg.split('=', 1)[1]
+
     print('\nBuilding our map')
-    my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
-    my_map.print()
+    with prof.phase('build'):
+        my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
+    with prof.phase('render'):
+        my_map.print()
 
     print('Starting the search\n')
-    search(my_map)
+    trace = searchtrace.SearchTrace(my_map) if trace_path else None
+    with prof.phase('search'):
+        search(my_map, trace)
+    if trace is not None:
+        trace.save(trace_path)
+    prof.finish()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
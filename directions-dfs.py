@@ -1,17 +1,14 @@
 ### chap11/directions-dfs.py
+import sys
 import maze
+import profiling
+import route
+from treenote import TreeNote
 
 # Marks for map, which use color codes for terminal printing
 EXPLORED = '\033[34m*\033[0m' # blue *
 FRONTIER = '\033[32mf\033[0m' # green f
 
-# Keep track of the tree of explored paths
-class TreeNote():
-    def __init__(self, state, parent, action):
-        self.state = state    # current location 
-        self.parent = parent  # previous note in path
-        self.action = action  # action that got us to this location
-
 def search(my_map):
     # Set the current state and mark the map location explored
     cur_loc = my_map.start
@@ -54,28 +51,30 @@ def search(my_map):
 
     # Follow the parent links from cur_note to create
     # the actual driving directions
-    ddirections = [cur_note]
-    while cur_note.parent:  # while parent exists
-        cur_note = cur_note.parent
-        ddirections.insert(0, cur_note)
+    ddirections = route.from_note(cur_note)
 
     # Print out the driving directions
     print('## Solution ##')
-    print(f'Starting at {ddirections[0].state}')
-    ddirections.pop(0)
-    for n in ddirections:
-        print(f'Go {n.action} then')
+    print(f'Starting at {ddirections.start}')
+    for step in ddirections.instructions():
+        print(step)
     print('Arrive at your goal')
     return
 
 
 def main():
+    prof = profiling.Profile(sys.argv)   # takes --profile[=PATH]
+
     print('\nBuilding our map')
-    my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
-    my_map.print()
+    with prof.phase('build'):
+        my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
+    with prof.phase('render'):
+        my_map.print()
 
     print('Starting the search\n')
-    search(my_map)
+    with prof.phase('search'):
+        search(my_map)
+    prof.finish()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
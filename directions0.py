@@ -1,5 +1,7 @@
 ### chap11/directions0.py -- Finding driving directions (first try)
+import sys
 import maze
+import profiling
 
 # Marks for map, which use color codes for terminal printing
 EXPLORED = '\033[34m*\033[0m' # blue *
@@ -47,12 +49,18 @@ def search(my_map):
 
 
 def main():
+    prof = profiling.Profile(sys.argv)   # takes --profile[=PATH]
+
     print('\nBuilding our map')
-    my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
-    my_map.print()
+    with prof.phase('build'):
+        my_map = maze.Maze(maze.MAZE_map, maze.MAZE_map_endpts)
+    with prof.phase('render'):
+        my_map.print()
 
     print('Starting the search')
-    search(my_map)
+    with prof.phase('search'):
+        search(my_map)
+    prof.finish()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,217 @@
+### chap11/distmap.py -- Precomputed wall-aware distances over a maze
+from array import array
+from collections import deque
+
+# Pin.distance measures as the crow flies, straight through buildings,
+# and a pin usually sits in a building that nobody can stand in.  A
+# DistanceMap answers "how far, on foot" and "where can I stand" in
+# O(1) by doing the searches once, up front.
+#
+# A cell is open if it is inside the map and has at least one move out
+# of it.  For every cell, near[cid] is the closest open cell counting
+# grid steps and ignoring walls (an open cell is its own closest), so
+# any location, even one in a building, snaps to a place to stand.
+#
+# Each category of places (say, the highly rated pins) gets a layer:
+# dist[cid] is the number of moves from cell cid to the closest place
+# in the category, honoring walls and one-way streets, and goal[cid] is
+# the open cell where that route ends.  We compute a layer with one
+# breadth-first search that starts at all the category's places at
+# once and follows the moves backwards.  -1 marks "no such route."
+# A place that isn't open, like a pin in a building, is reached at any
+# open cell beside it; only a place with no open cell beside it falls
+# back on near[].
+
+class DistanceMap(object):
+    """Abstraction: A DistanceMap holds precomputed distances over the
+       maze my_map.  If my_map's walls are edited, the next query redoes
+       the searches, once for the whole batch of edits.
+
+       is_open(loc): True if someone can stand at loc.
+
+       snap(loc): Returns the open location closest to loc.
+
+       add_category(name, locs): Precomputes walking distances to the
+       locations in locs.  A location someone can't stand at counts as
+       reached from any open cell beside it (or, if there are none,
+       from the closest open cell).
+
+       distance(loc, name): Returns the number of moves from loc to the
+       nearest location of category name, or None if none is reachable.
+
+       nearest(loc, name): Returns the open location where that route
+       ends, or None.
+
+       in_sight(a, b): True if a and b are in the same row or column
+       with no wall between them.
+    """
+    # Implementation details: Everything is indexed by Maze cell id and
+    # stored in array('i'), so a layer costs 8 bytes a cell.  We keep
+    # each category's locations so that we can rebuild its layer.
+
+    def __init__(self, my_map):
+        self.my_map = my_map
+        self.places = {}
+        self.__build()
+
+    def __build(self):
+        # Hidden helper: (re)computes everything from my_map's walls
+        my_map = self.my_map
+        self.version = my_map.version
+        n = len(my_map.locs)
+        self.open = bytearray(
+            my_map.locs[cid] in my_map and
+            any(my_map.move_id(cid, code) != cid for code in range(4))
+            for cid in range(n))
+        self.near = self.__nearest_open()
+        self.layers = {}
+
+        # The reverse move graph, for the category searches
+        self.preds = [[] for _ in range(n)]
+        for cid in range(n):
+            if self.open[cid]:
+                for code in range(4):
+                    other = my_map.move_id(cid, code)
+                    if other != cid and self.open[other]:
+                        self.preds[other].append(cid)
+        for name, locs in self.places.items():
+            self.add_category(name, locs)
+
+    def __check(self):
+        # Hidden helper: catches up with edits to my_map's walls
+        if self.version != self.my_map.version:
+            self.__build()
+
+    def __grid_neighbors(self, cid):
+        # Hidden helper: the cell ids next to cid, ignoring walls
+        h2 = self.my_map.height + 2
+        y = cid % h2
+        return [other for other in (cid + 1 if y + 1 < h2 else -1,
+                                    cid - 1 if y > 0 else -1,
+                                    cid + h2, cid - h2)
+                if 0 <= other < len(self.open)]
+
+    def __nearest_open(self):
+        # Hidden helper: multi-source BFS over the grid from every open
+        # cell, ignoring walls
+        n = len(self.open)
+        near = array('i', [-1] * n)
+        todo = deque()
+        for cid in range(n):
+            if self.open[cid]:
+                near[cid] = cid
+                todo.append(cid)
+        while todo:
+            cid = todo.popleft()
+            for other in self.__grid_neighbors(cid):
+                if near[other] == -1:
+                    near[other] = near[cid]
+                    todo.append(other)
+        return near
+
+    def is_open(self, loc):
+        self.__check()
+        return bool(self.open[self.my_map.cell_id(loc)])
+
+    def snap(self, loc):
+        self.__check()
+        cid = self.near[self.my_map.cell_id(loc)]
+        assert cid != -1, 'the map has no open cells'
+        return self.my_map.locs[cid]
+
+    def add_category(self, name, locs):
+        self.__check()
+        self.places[name] = locs = list(locs)
+        n = len(self.open)
+        dist = array('i', [-1] * n)
+        goal = array('i', [-1] * n)
+        todo = deque()
+        for loc in locs:
+            cid = self.my_map.cell_id(loc)
+            if self.open[cid]:
+                seeds = [cid]
+            else:
+                seeds = [other for other in self.__grid_neighbors(cid)
+                         if self.open[other]]
+                if not seeds and self.near[cid] != -1:
+                    seeds = [self.near[cid]]
+            for seed in seeds:
+                if dist[seed] == -1:
+                    dist[seed] = 0
+                    goal[seed] = seed
+                    todo.append(seed)
+        while todo:
+            cid = todo.popleft()
+            for other in self.preds[cid]:
+                if dist[other] == -1:
+                    dist[other] = dist[cid] + 1
+                    goal[other] = goal[cid]
+                    todo.append(other)
+        self.layers[name] = (dist, goal)
+
+    def distance(self, loc, name):
+        self.__check()
+        dist, _ = self.layers[name]
+        d = dist[self.near[self.my_map.cell_id(loc)]]
+        return None if d == -1 else d
+
+    def nearest(self, loc, name):
+        self.__check()
+        _, goal = self.layers[name]
+        cid = goal[self.near[self.my_map.cell_id(loc)]]
+        return None if cid == -1 else self.my_map.locs[cid]
+
+    def in_sight(self, a, b):
+        if a[0] != b[0] and a[1] != b[1]:
+            return False
+        if a[0] == b[0]:
+            code = 0 if b[1] > a[1] else 2      # north or south
+        else:
+            code = 1 if b[0] > a[0] else 3      # east or west
+        cid = self.my_map.cell_id(a)
+        target = self.my_map.cell_id(b)
+        while cid != target:
+            nxt = self.my_map.move_id(cid, code)
+            if nxt == cid:
+                return False
+            cid = nxt
+        return True
+
+
+def main():
+    # Just a testing routine
+    from city import CitySqGrid
+    from pin import Pin
+    import bfs
+
+    nyc = CitySqGrid(6)
+    pins = [Pin((3,11), "Park", "Lots of squirrels", 5),
+            Pin((9,1), "Bakery", "Free dog treats!", 5)]
+    dm = DistanceMap(nyc)
+    dm.add_category('good', [p.loc for p in pins if p.stars >= 3])
+
+    for pin in pins:
+        print(f'{pin.name} at {pin.loc}: stand at {dm.snap(pin.loc)}')
+    for loc in [nyc.start, (1, 1), (10, 12)]:
+        print(f'From {loc}: {dm.distance(loc, "good")} moves to the '
+              f'nearest good pin, ending at {dm.nearest(loc, "good")}')
+
+    # Right beside a pin, you are already there
+    dm.add_category('hydrant', [(7, 9)])
+    print(f'From (8, 9): {dm.distance((8, 9), "hydrant")} moves to the '
+          f'hydrant at (7, 9)')
+
+    # Check every open cell against a plain search that, like us,
+    # stops beside a goal inside a building
+    for cid, loc in enumerate(nyc.locs):
+        if dm.open[cid]:
+            route = bfs.nearest_goal(nyc, loc, [p.loc for p in pins],
+                                     adjacent=True)[1]
+            assert dm.distance(loc, 'good') == \
+                (None if route is None else len(route)), loc
+    print('Distances agree with bfs.nearest_goal')
+    print(f'(6,6) sees (6,1): {dm.in_sight((6,6), (6,1))}; '
+          f'(6,5) sees (8,5): {dm.in_sight((6,5), (8,5))}')
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 ### chap11/dogwalk.py -- Self-avoiding random dog walk
+import sys
 from city import CitySqGrid
 import random
+import profiling
 
 # Our faithful dog and the scent he smells
 Cosmo = '\N{DOG FACE}'
@@ -35,17 +37,24 @@ def dogwalk(my_city):
     return True
 
 def main():
+    prof = profiling.Profile(sys.argv)   # takes --profile[=PATH]
+
     print('\nBuilding a city with a 4x4 square grid')
-    nyc = CitySqGrid(4, Cosmo)
-    print(nyc)
+    with prof.phase('build'):
+        nyc = CitySqGrid(4, Cosmo)
+    with prof.phase('render'):
+        print(nyc)
 
     # Cosmo walks himself
-    success = dogwalk(nyc)
-    print(nyc)
+    with prof.phase('walk'):
+        success = dogwalk(nyc)
+    with prof.phase('render'):
+        print(nyc)
     if success:
         print(f'Cosmo is frolicking in the fields!')
     else:
         print(f'Cosmo hit a dead-end.')
+    prof.finish()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,148 @@
+### chap11/exact.py -- Exact dead-end odds for a self-avoiding dog walk
+import sys
+import multiprocessing
+from fractions import Fraction
+from city import CitySqGrid
+
+# sim.py estimates how often `dogwalk` hits a dead end by running many
+# random trials.  For small cities, we can instead enumerate every
+# self-avoiding walk from the city center and weight each one by its
+# probability, which is the product of 1/len(moves) over its steps.
+#
+# We work with cell ids (see class Maze) and keep the set of visited
+# cells as the bits of an int.  A walk's future depends only on where
+# it is and which cells it has visited, so we memoize on that pair.
+# The square city also looks the same under its 8 rotations and
+# reflections about the center.  We expand the first few steps of the
+# walk, merge partial walks that are mirror images of each other, and
+# hand one representative of each group to a pool of processes.
+#
+# The number of self-avoiding walks grows very quickly with the city's
+# size.  Cities up to 6 blocks on a side take well under a second; an
+# 8-block city is already out of reach.
+
+def walk_graph(size):
+    """Returns (adj, inside, start, transforms) for a size x size city.
+       adj[cid] lists the cells reachable in one step from cell cid, in
+       the order possible_moves reports them; inside[cid] is True for
+       cells in the city; start is the center's cell id; and transforms
+       is a list of 8 lists mapping each cell id to its image under one
+       of the city's symmetries."""
+    city = CitySqGrid(size)
+    h2 = city.height + 2
+    adj = []
+    for cid, loc in enumerate(city.locs):
+        adj.append([city.move_id(cid, code) for code in (0, 2, 1, 3)
+                    if city.move_id(cid, code) != cid])
+    inside = [loc in city for loc in city.locs]
+
+    c = size   # the center is at (size, size)
+    transforms = []
+    for swap in (False, True):
+        for sx in (1, -1):
+            for sy in (1, -1):
+                t = []
+                for x, y in city.locs:
+                    dx, dy = x - c, y - c
+                    if swap:
+                        dx, dy = dy, dx
+                    t.append((c + sx * dx) * h2 + (c + sy * dy))
+                transforms.append(t)
+    return adj, inside, city.cell_id(city.start), transforms
+
+
+# Per-process state, set by _init
+_adj = None
+_inside = None
+_memo = None
+
+def _init(size):
+    global _adj, _inside, _memo
+    _adj, _inside, _, _ = walk_graph(size)
+    _memo = {}
+
+def _dead_end(cur, visited):
+    # Probability that a walk now at cur, having already left the cells
+    # in `visited`, ends in a dead end
+    if not _inside[cur]:
+        return 0
+    key = (cur, visited)
+    p = _memo.get(key)
+    if p is not None:
+        return p
+
+    nexts = [n for n in _adj[cur] if not visited >> n & 1]
+    if len(nexts) == 0:
+        p = Fraction(1)
+    else:
+        visited |= 1 << cur
+        p = sum((_dead_end(n, visited) for n in nexts),
+                Fraction(0)) / len(nexts)
+    _memo[key] = p
+    return p
+
+def _solve(state):
+    # Runs in a worker process
+    return _dead_end(*state)
+
+
+def _canonical(cur, visited, transforms):
+    # The smallest image of (cur, visited) under the city's symmetries
+    best = None
+    for t in transforms:
+        v = 0
+        bits = visited
+        while bits:
+            low = bits & -bits
+            v |= 1 << t[low.bit_length() - 1]
+            bits ^= low
+        image = (t[cur], v)
+        if best is None or image < best:
+            best = image
+    return best
+
+def dead_end_probability(size, levels=8, processes=None):
+    """Returns the exact probability, as a Fraction, that a dogwalk in
+       a size x size CitySqGrid ends in a dead end.  The first `levels`
+       steps are expanded and merged by symmetry before the remaining
+       work is spread over `processes` worker processes."""
+    adj, inside, start, transforms = walk_graph(size)
+
+    # Expand the first few steps, keeping the probability of reaching
+    # each (cur, visited) state and merging mirror-image states
+    result = Fraction(0)
+    states = {(start, 0): Fraction(1)}
+    for _ in range(levels):
+        expanded = {}
+        for (cur, visited), p in states.items():
+            if not inside[cur]:
+                continue                   # escaped: not a dead end
+            nexts = [n for n in adj[cur] if not visited >> n & 1]
+            if len(nexts) == 0:
+                result += p                # dead end
+                continue
+            for n in nexts:
+                key = _canonical(n, visited | 1 << cur, transforms)
+                expanded[key] = expanded.get(key, 0) + p / len(nexts)
+        states = expanded
+
+    # Finish each remaining state in parallel
+    todo = list(states)
+    with multiprocessing.Pool(processes, _init, (size,)) as pool:
+        for state, p in zip(todo, pool.map(_solve, todo)):
+            result += states[state] * p
+    return result
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python3 exact.py blocks [levels]")
+    blocks = int(sys.argv[1])  # on a side of the square grid; try 4
+    levels = int(sys.argv[2]) if len(sys.argv) == 3 else 8
+
+    p = dead_end_probability(blocks, levels)
+    print(f'P(dead end) = {p}')
+    print(f'{float(100 * p):.4f}% dead ends')
+
+if __name__ == '__main__':
+    main()
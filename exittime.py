@@ -0,0 +1,224 @@
+### chap11/exittime.py -- How long until a random walk leaves the city?
+import sys
+import random
+from collections import deque
+
+# A plain random walk (one that may revisit cells) is an absorbing
+# Markov chain: the cells inside the map are its transient states and
+# the border cells are its absorbing states.  Let Q hold the transition
+# probabilities among inside cells and R those from inside cells to
+# border cells.  Then the expected number of steps t before leaving
+# solves (I - Q) t = 1, and the probabilities B of leaving through each
+# border cell solve (I - Q) B = R.  Both are sparse, banded systems when
+# the cells are numbered by cell id, so we solve them with a small
+# sparse Gaussian elimination and never build a dense matrix.
+#
+# A self-avoiding walk (like `dogwalk`) remembers where it has been, so
+# it is not a Markov chain over cells.  For it, `simulate` estimates the
+# same quantities by Monte Carlo.
+
+def _neighbors(my_map, cid):
+    # The distinct cells one step away from cid
+    return [n for n in (my_map.move_id(cid, code) for code in range(4))
+            if n != cid]
+
+def _solve(rows, rhs):
+    # Gaussian elimination without pivoting on a sparse system.  rows[i]
+    # is a dict {column: value} and rhs[i] is a list of right-hand side
+    # values for row i.  Works in place and returns the solutions, one
+    # list per row.  I - Q is an M-matrix here, so no pivoting is needed.
+    n = len(rows)
+
+    # below[k] is the set of rows i > k with a nonzero in column k
+    below = [set() for _ in range(n)]
+    for i, row in enumerate(rows):
+        for j in row:
+            if j < i:
+                below[j].add(i)
+
+    for k in range(n):
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        upper = [(j, v) for j, v in pivot_row.items() if j > k]
+        for i in below[k]:
+            row = rows[i]
+            factor = row.pop(k) / pivot
+            for j, v in upper:
+                if j not in row:
+                    row[j] = 0.0
+                    if j < i:
+                        below[j].add(i)
+                row[j] -= factor * v
+            rhs_i, rhs_k = rhs[i], rhs[k]
+            for c in range(len(rhs_i)):
+                rhs_i[c] -= factor * rhs_k[c]
+        below[k] = None
+
+    x = [None] * n
+    for k in range(n - 1, -1, -1):
+        row = rows[k]
+        sol = rhs[k][:]
+        for j, v in row.items():
+            if j > k:
+                xj = x[j]
+                for c in range(len(sol)):
+                    sol[c] -= v * xj[c]
+        pivot = row[k]
+        x[k] = [s / pivot for s in sol]
+    return x
+
+def exit_stats(my_map, start=None):
+    """Solves for a plain random walk from start (default: the map's
+       start) over my_map, where each step goes to a uniformly chosen
+       neighboring cell that isn't behind a wall.  Returns a pair: the
+       expected number of steps before the walk reaches a border cell,
+       and a dictionary mapping each border cell to the probability
+       that the walk leaves through it.  Raises ValueError if the walk
+       can get trapped where no border cell is reachable."""
+    if start is None:
+        start = my_map.start
+    start_id = my_map.cell_id(start)
+    if start not in my_map:
+        return 0.0, {start: 1.0}
+
+    # The inside cells the walk can reach, in cell id order
+    seen = {start_id}
+    todo = deque([start_id])
+    while todo:
+        cid = todo.popleft()
+        if my_map.locs[cid] not in my_map:
+            continue
+        for n in _neighbors(my_map, cid):
+            if n not in seen:
+                seen.add(n)
+                todo.append(n)
+    inside = sorted(c for c in seen if my_map.locs[c] in my_map)
+    exits = sorted(c for c in seen if my_map.locs[c] not in my_map)
+    if not exits:
+        raise ValueError('the walk can never leave the map')
+
+    # Every one of them must be able to reach a border cell, or I - Q
+    # is singular.  Search backwards from the border cells to check.
+    preds = {c: [] for c in seen}
+    for c in inside:
+        for n in _neighbors(my_map, c):
+            preds[n].append(c)
+    can_leave = set(exits)
+    todo = deque(exits)
+    while todo:
+        for p in preds[todo.popleft()]:
+            if p not in can_leave:
+                can_leave.add(p)
+                todo.append(p)
+    if len(can_leave) != len(seen):
+        raise ValueError('the walk can get trapped inside the map')
+
+    index = {c: i for i, c in enumerate(inside)}
+    exit_col = {c: 1 + k for k, c in enumerate(exits)}
+
+    # Build I - Q and [1 | R], row by row
+    rows, rhs = [], []
+    for cid in inside:
+        i = index[cid]
+        nbrs = _neighbors(my_map, cid)
+        p = 1.0 / len(nbrs)
+        row = {i: 1.0}
+        b = [0.0] * (1 + len(exits))
+        b[0] = 1.0
+        for n in nbrs:
+            if n in index:
+                row[index[n]] = row.get(index[n], 0.0) - p
+            else:
+                b[exit_col[n]] += p
+        rows.append(row)
+        rhs.append(b)
+
+    sol = _solve(rows, rhs)[index[start_id]]
+    probs = {my_map.locs[c]: sol[exit_col[c]] for c in exits
+             if sol[exit_col[c]] > 0.0}
+    return sol[0], probs
+
+
+def simulate(my_map, trials, self_avoiding=True, start=None, seed=None):
+    """Monte Carlo version of exit_stats, which also handles the
+       self-avoiding walk of `dogwalk`.  Runs `trials` walks and returns
+       a triple: the fraction of walks that hit a dead end, the mean
+       number of steps taken by the walks that escaped, and a dictionary
+       mapping each border cell to the fraction of walks leaving by it.
+       The map's contents are never touched."""
+    rng = random.Random(seed)
+    if start is None:
+        start = my_map.start
+    start_id = my_map.cell_id(start)
+    nbrs = [None] * len(my_map.locs)
+    inside = bytearray(loc in my_map for loc in my_map.locs)
+
+    dead_ends = 0
+    steps_total = 0
+    exits = {}
+    for _ in range(trials):
+        visited = set()
+        cid = start_id
+        steps = 0
+        while inside[cid]:
+            if nbrs[cid] is None:
+                nbrs[cid] = _neighbors(my_map, cid)
+            if self_avoiding:
+                visited.add(cid)
+                choices = [n for n in nbrs[cid] if n not in visited]
+            else:
+                choices = nbrs[cid]
+            if not choices:
+                break
+            cid = choices[int(rng.random() * len(choices))]
+            steps += 1
+        if inside[cid]:
+            dead_ends += 1
+        else:
+            steps_total += steps
+            loc = my_map.locs[cid]
+            exits[loc] = exits.get(loc, 0) + 1
+
+    escaped = trials - dead_ends
+    mean_steps = steps_total / escaped if escaped else float('inf')
+    return (dead_ends / trials, mean_steps,
+            {loc: n / trials for loc, n in exits.items()})
+
+
+def _by_side(my_map, probs):
+    # Totals exit probabilities by the side of the map they leave from
+    sides = {'north': 0.0, 'east': 0.0, 'south': 0.0, 'west': 0.0}
+    for (x, y), p in probs.items():
+        if y == my_map.height + 1:
+            sides['north'] += p
+        elif x == my_map.width + 1:
+            sides['east'] += p
+        elif y == 0:
+            sides['south'] += p
+        else:
+            sides['west'] += p
+    return ', '.join(f'{s} {p:.3f}' for s, p in sides.items())
+
+def main():
+    from city import CitySqGrid
+
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python3 exittime.py blocks [trials]")
+    blocks = int(sys.argv[1])  # on a side of the square grid; try 4
+    trials = int(sys.argv[2]) if len(sys.argv) == 3 else 2000
+
+    my_city = CitySqGrid(blocks)
+    steps, probs = exit_stats(my_city)
+    print(f'Plain walk, exact: {steps:.2f} expected steps to leave')
+    print(f'  leaves by: {_by_side(my_city, probs)}')
+
+    _, mc_steps, mc_probs = simulate(my_city, trials, False)
+    print(f'Plain walk, {trials} trials: {mc_steps:.2f} mean steps')
+    print(f'  leaves by: {_by_side(my_city, mc_probs)}')
+
+    dead, mc_steps, _ = simulate(my_city, trials, True)
+    print(f'Self-avoiding walk, {trials} trials: {100 * dead:.1f}% dead '
+          f'ends, {mc_steps:.2f} mean steps when it escapes')
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,17 @@
 # Useful globals
 NO_LOC = (-1,-1)
 
+# Integer direction codes.  DIRECTIONS[code] gives the direction's letter,
+# and DIR_CODES maps a letter back to its code.
+NORTH, EAST, SOUTH, WEST = 0, 1, 2, 3
+DIRECTIONS = 'nesw'
+DIR_CODES = {'n': NORTH, 'e': EAST, 's': SOUTH, 'w': WEST}
+
+# The Cell attribute holding the wall in each direction, and the
+# direction code of each one-step (dx, dy) offset
+WALLS = ('northwall', 'eastwall', 'southwall', 'westwall')
+STEP_CODES = {(0, 1): NORTH, (1, 0): EAST, (0, -1): SOUTH, (-1, 0): WEST}
+
 class Cell(object):
     """Abstraction: Collects together everything about a maze cell
 
@@ -11,15 +22,21 @@ class Cell(object):
 
        instance.content: storage for what's at this cell.
     """
-    # Implementation details: NONE
+    # Implementation details: A maze holds one Cell per location, so we
+    # use __slots__ to skip the per-object dictionary.
+    __slots__ = ('northwall', 'eastwall', 'southwall', 'westwall', 'content')
     
     def __init__(self, config):
         """Expects the wall configuration info as a single hexadecimal digit,
         where the most significant bit (msb) represents north, the next msb
         east, and so forth in a clockwise direction.  Most of the time we
         initialize a maze cell with a blank space, and so that's the default
-        behavior of this constructor."""
-        walls = int(config, base=16)
+        behavior of this constructor.  The wall configuration may also be
+        given directly as the equivalent int."""
+        if isinstance(config, int):
+            walls = config
+        else:
+            walls = int(config, base=16)
         self.northwall = (walls & 0x8) != 0
         self.eastwall = (walls & 0x4) != 0
         self.southwall = (walls & 0x2) != 0
@@ -61,6 +78,9 @@ class Maze(object):
        self.start: grid location where we start
        self.goal: grid location where we find the goal
 
+       self.version: a number that changes whenever the walls do, so
+       that anything computed from them can tell when it is stale
+
        Each method contains its own docstring explaining its interface.
        """
     # Implementation details: The grid is two rows and two columns bigger
@@ -82,6 +102,24 @@ class Maze(object):
     # top-left-to-bottom-right printing of a map) and the 2D grid that
     # counts from bottom-left-to-top-right. This mismatch makes the
     # implementation of `__init__` and `__str__` tricky.
+    #
+    # Each location also has an integer **cell id**, which is
+    # x * (height+2) + y.  The move table, self.moves, is a flat list
+    # indexed by cell_id * 4 + direction code that holds the cell id
+    # reached by that move (the same cell id if a wall blocks the move).
+    # self.locs maps a cell id back to its (x,y) tuple, so that a move
+    # never has to build a new tuple.  The move table is computed once
+    # from the walls at the end of `__init__`.  Change walls afterwards
+    # with `apply_edits` (or the single-edit methods built on it), which
+    # patches just the affected entries; if you set a Cell's wall
+    # attributes directly, you must call `build_moves` again.
+    #
+    # `mark` records each location it changes in self.dirty, so that a
+    # renderer can redraw just those locations and then clear the set.
+    # It also records them in self.modified, which lets `reset` blank
+    # only the cells changed since the previous reset instead of every
+    # cell in the grid.  Anything that changes a cell's content without
+    # calling `mark` must add the location to both sets itself.
 
     def __check_endpt(self, pt):
         # Hidden helper function for __init__ that verifies that the maze's
@@ -104,6 +142,10 @@ class Maze(object):
         # cells: string of hex digits describing the walls seen in each maze cell
         # endpts: string describing the start and goal points as (x,y) tuples
         #
+        # Programs that generate mazes can skip the strings: `cells` may
+        # instead be a list of rows (north row first), each a sequence of
+        # wall ints, and `endpts` may be a (start, goal) pair of tuples.
+        #
         # Note that the configuration data in `cells` describes only the
         # walls seen in the maze. This function creates the walls seen in
         # each border cell, which requires some trickiness to be able to
@@ -113,7 +155,10 @@ class Maze(object):
         assert cells != '' and endpts != ''
         
         # Compute the grid's height and width from cells' configuration data
-        rows = cells.splitlines()
+        if isinstance(cells, str):
+            rows = cells.splitlines()
+        else:
+            rows = cells
         self.height = len(rows)
         self.width = len(rows[0])
         
@@ -166,10 +211,13 @@ class Maze(object):
 
         # Process start and goal endpoints. There should be no spaces except
         # between the two endpoint tuples, e.g., '(1,7) (12,1)'.
-        endpts = endpts.split()
-        self.start = eval(endpts[0])    # From string to tuple
+        if isinstance(endpts, str):
+            endpts = endpts.split()
+            self.start = eval(endpts[0])    # From string to tuple
+            self.goal = eval(endpts[1])
+        else:
+            self.start, self.goal = endpts
         self.__check_endpt(self.start)
-        self.goal = eval(endpts[1])
         self.__check_endpt(self.goal)
 
         # Mark the contents of the start and goal points in the grid
@@ -180,6 +228,154 @@ class Maze(object):
             x, y = self.goal
             self.grid[x][y].content = 'g'
 
+        # Locations marked since a renderer last drew the maze, and
+        # since the last reset
+        self.dirty = set()
+        self.modified = set()
+
+        # Precompute the destination of every possible move
+        self.version = 0
+        self.build_moves()
+
+    def __cell_moves(self, x, y):
+        # Hidden helper: the four move table entries for location (x,y),
+        # in the order of the direction codes: n, e, s, w
+        h2 = self.height + 2
+        c = self.grid[x][y]
+        cid = x * h2 + y
+        return (cid if c.northwall or y == self.height + 1 else cid + 1,
+                cid if c.eastwall or x == self.width + 1 else cid + h2,
+                cid if c.southwall or y == 0 else cid - 1,
+                cid if c.westwall or x == 0 else cid - h2)
+
+    def build_moves(self):
+        """(Re)builds the move table from the walls in the grid"""
+        h2 = self.height + 2
+        self.locs = [(x, y) for x in range(self.width + 2)
+                     for y in range(h2)]
+        self.moves = []
+        for x, y in self.locs:
+            self.moves.extend(self.__cell_moves(x, y))
+        self.version += 1
+
+    def __wall_changes(self, op, a, b):
+        # Hidden helper for apply_edits: validates one edit and returns
+        # the walls it sets, as (location, direction code, closed)
+        for loc in (a, b):
+            if not (0 <= loc[0] < self.width + 2 and
+                    0 <= loc[1] < self.height + 2):
+                raise ValueError(f'{loc} is off the map')
+        code = STEP_CODES.get((b[0] - a[0], b[1] - a[1]))
+        if code is None:
+            raise ValueError(f'{a} and {b} are not neighbors')
+        back = (code + 2) % 4
+
+        if op == 'close':
+            return [(a, code, True), (b, back, True)]
+        elif op == 'open':
+            return [(a, code, False), (b, back, False)]
+        elif op == 'one_way':
+            return [(a, code, False), (b, back, True)]
+        elif op == 'flip':
+            ab = getattr(self.grid[a[0]][a[1]], WALLS[code])
+            ba = getattr(self.grid[b[0]][b[1]], WALLS[back])
+            if ab == ba:
+                raise ValueError(f'{a}-{b} is not a one-way street')
+            return [(a, code, not ab), (b, back, not ba)]
+        raise ValueError(f'unknown edit {op!r}')
+
+    def __patch_moves(self, locs):
+        # Hidden helper: recomputes the move table entries of locs
+        h2 = self.height + 2
+        for x, y in locs:
+            i = (x * h2 + y) * 4
+            self.moves[i:i + 4] = self.__cell_moves(x, y)
+
+    def apply_edits(self, edits, check=None):
+        """Applies a batch of wall edits as one transaction.  Each edit
+           is a tuple (op, a, b) naming two neighboring locations a and
+           b and one of these ops:
+
+             'close'    wall off the street between a and b, both ways
+             'open'     open it both ways
+             'one_way'  let traffic go only from a to b
+             'flip'     reverse the direction of a one-way street
+
+           Edits apply in order, so a later edit sees earlier ones.  If
+           an edit is invalid (raising ValueError), or if check is given
+           and check(self) returns False once all the edits are in
+           (raising ValueError), every wall is put back as it was.
+           Otherwise, the move table is patched for the touched cells and
+           the version changes, once for the whole batch.  It changes
+           before check runs, so that check sees the edited walls through
+           anything that watches the version, and again if check rejects
+           the batch.  Returns the number of edits applied."""
+        undo = []       # (cell, attribute, old value), oldest first
+        touched = set()
+        count = 0
+        bumped = False
+        try:
+            for op, a, b in edits:
+                for (x, y), code, closed in self.__wall_changes(op, a, b):
+                    cell, attr = self.grid[x][y], WALLS[code]
+                    undo.append((cell, attr, getattr(cell, attr)))
+                    setattr(cell, attr, closed)
+                    touched.add((x, y))
+                count += 1
+            self.__patch_moves(touched)
+            if touched:
+                self.version += 1
+                bumped = True
+            if check is not None and not check(self):
+                raise ValueError('edits rejected by check')
+        except Exception:
+            for cell, attr, old in reversed(undo):
+                setattr(cell, attr, old)
+            self.__patch_moves(touched)
+            if bumped:
+                self.version += 1
+            raise
+        return count
+
+    def close_street(self, a, b):
+        """Walls off the street between neighbors a and b"""
+        self.apply_edits([('close', a, b)])
+
+    def open_street(self, a, b):
+        """Opens the street between neighbors a and b both ways"""
+        self.apply_edits([('open', a, b)])
+
+    def one_way(self, a, b):
+        """Makes the street between neighbors a and b one-way, a to b"""
+        self.apply_edits([('one_way', a, b)])
+
+    def flip_one_way(self, a, b):
+        """Reverses the one-way street between neighbors a and b"""
+        self.apply_edits([('flip', a, b)])
+
+    def wall_masks(self):
+        """Returns a bytearray, indexed by cell id, holding each cell's
+           walls in the same 4-bit encoding as the configuration data"""
+        masks = bytearray(len(self.locs))
+        for cid, (x, y) in enumerate(self.locs):
+            c = self.grid[x][y]
+            masks[cid] = (c.northwall << 3 | c.eastwall << 2 |
+                          c.southwall << 1 | c.westwall)
+        return masks
+
+    def cell_id(self, location):
+        """Return the cell id of the specified location in the maze"""
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        return x * (self.height + 2) + y
+
+    def move_id(self, cid, code):
+        """Given a cell id and a direction code, return the cell id
+           reached by that move.  Returns cid itself if a wall
+           blocks the move.  No checking and no allocation."""
+        return self.moves[cid * 4 + code]
+
     def __contains__(self, loc):
         """True if loc inside maze, not on a border"""
         x, y = loc
@@ -273,6 +469,12 @@ class Maze(object):
 
         return m
 
+    def row_str(self, j):
+        """Returns the line of characters that __str__ prints for the
+           contents of grid row j (no wall characters below it)"""
+        row = [self.grid[i][j] for i in range(self.width + 2)]
+        return self.__str_row(row, None)[:-1]
+
     def print(self):
         # First, make it easier to see the non-roads
         for i in range(self.width+2):
@@ -280,6 +482,7 @@ class Maze(object):
                 c = self.grid[i][j]
                 if c.northwall and c.southwall and c.eastwall and c.westwall:
                     c.content = '\033[40m \033[0m' # inverse-video space
+                    self.modified.add((i, j))
 
         print(self.__str__())
 
@@ -290,6 +493,24 @@ class Maze(object):
         assert x >= 0 and x < self.width + 2, f'bad x in {location}'
         assert y >= 0 and y < self.height + 2, f'bad y in {location}'
         self.grid[x][y].content = character
+        self.dirty.add(location)
+        self.modified.add(location)
+
+    def mark_many(self, xs, ys, characters):
+        """Given sequences of x and y coordinates and a matching sequence
+           of characters, put each character at its location in the
+           maze.  The bounds are checked once for the whole batch."""
+        if len(xs) == 0:
+            return
+        assert len(xs) == len(ys) == len(characters), 'batch size mismatch'
+        assert min(xs) >= 0 and max(xs) < self.width + 2, 'bad x in batch'
+        assert min(ys) >= 0 and max(ys) < self.height + 2, 'bad y in batch'
+        locs = list(zip(xs, ys))
+        grid = self.grid
+        for (x, y), c in zip(locs, characters):
+            grid[x][y].content = c
+        self.dirty.update(locs)
+        self.modified.update(locs)
 
     def get_mark(self, location):
         """Return the contents of the specified location in the maze"""
@@ -299,15 +520,34 @@ class Maze(object):
         return self.grid[x][y].content
     
     def reset(self):
-        """Resets all cell contents to their original state"""
-        for i in range(self.width + 2):
-            for j in range(self.height + 2):
-                self.mark((i,j), ' ')
+        """Resets all cell contents to their original state.  Only the
+           locations changed since the last reset are touched."""
+        for x, y in self.modified:
+            self.grid[x][y].content = ' '
+        self.dirty |= self.modified
+        self.modified.clear()
         if self.start != NO_LOC:
             self.mark(self.start, 's')
         if self.goal != NO_LOC:
             self.mark(self.goal, 'g')
 
+    def snapshot(self):
+        """Returns a copy of the contents of every cell, which you
+           can later hand to restore()"""
+        contents = [c.content for column in self.grid for c in column]
+        return (contents, frozenset(self.modified))
+
+    def restore(self, snapshot):
+        """Puts back the contents of every cell as they were when
+           snapshot() was called"""
+        contents, modified = snapshot
+        h2 = self.height + 2
+        for i, column in enumerate(self.grid):
+            for c, content in zip(column, contents[i * h2:(i + 1) * h2]):
+                c.content = content
+        self.dirty |= self.modified | modified
+        self.modified = set(modified)
+
     def possible_moves(self, location, visited_character):
         """Given a location and the character that marks previously
            visted locations, return a list of possible moves from
@@ -352,28 +592,18 @@ class Maze(object):
            ASSUMPTION: It is up to the caller to guarantee that the location
            is within the grid or its borders."""
         
-        # Get ready to move the character
-        c = self.get_mark(location)
-
-        # Pull apart location and use only the first letter of the direction
-        x, y = location
-        m = direction[0].lower()
-
-        # For each move possibility, make sure there's no wall there
-        # and the move won't leave the grid.
-        if m == 'n' and not self.grid[x][y].northwall and y != self.height + 1:
-            y += 1
-        if m == 's' and not self.grid[x][y].southwall and y != 0:
-            y -= 1
-        if m == 'e' and not self.grid[x][y].eastwall and x != self.width + 1:
-            x += 1
-        if m == 'w' and not self.grid[x][y].westwall and x != 0:
-            x -= 1
-        
-        new_loc = (x, y)
+        # Look up the move using only the first letter of the direction.
+        # An unknown direction leaves us where we are.
+        code = DIR_CODES.get(direction[0].lower())
+        cid = self.cell_id(location)
+        if code is None:
+            new_loc = self.locs[cid]
+        else:
+            new_loc = self.locs[self.moves[cid * 4 + code]]
 
         if make_move:
             # Move character.  Works even if no move took place
+            c = self.get_mark(location)
             self.mark(location, ' ')
             self.mark(new_loc, c)
 
@@ -391,153 +621,15 @@ class Maze(object):
         return self.move(location, direction, False)
 
 
-# Test mazes -- start/goal points stated as (x,y), where
-# we separate the two points with a space.  NOTE: There cannot
-# be a space inside the tuples!
-MAZE_test = '''988c
-3226'''
-MAZE_test_endpts = '(1,0) (0,1)'
-
-MAZE_empty = '''988c
-1004
-1004
-3226'''
-MAZE_empty_endpts = '(1,5) (4,0)'
-
-MAZE_big_empty = '''98888c
-100004
-100004
-100004
-322226'''
-MAZE_big_empty_endpts = '(0,1) (6,5)'
-
-MAZE_big = '''98888c
-100704
-100000
-100004
-122226'''
-MAZE_big_endpts = '(1,0) (7,3)'
-
-MAZE_blackhole = '''98888c
-104f14
-100800
-100004
-122226'''
-MAZE_blackhole_endpts = '(1,0) (7,3)'
-
-MAZE_city_fence = '''020202020
-4f5f5f5f1
-0a0a0a0a0
-4f5f5f5f1
-0a0a0a0a0
-4f5f5f5f1
-0a0a0a0a0
-4f5f5f5f1
-080808080'''
-MAZE_city_fence_endpts = '(5,5) (10,7)'
-
-MAZE_city = '''f5f5f5f
-a0a0a0a
-f5f5f5f
-a0a0a0a
-f5f5f5f
-a0a0a0a
-f5f5f5f'''
-MAZE_city_endpts = '(4,4) (8,6)'
-
-MAZE_map = '''dfdfdf9a8efd
-5f5f1a4f5ff5
-386f5f1a4ff5
-f5ff5f5f5ff5
-f3a86f5f3aa6
-fff5ff5fffff
-baa6ff3aaaae'''
-MAZE_map_endpts = '(1,1) (12,7)'
-
-MAZE_map_1way = '''dfdfdf9a8efd
-5f5f1acf5ff5
-386f5f1a4ff5
-f5ff5f5f5ff5
-f3a86f5f3aa6
-fff5ff5fffff
-baa6ff3aaaae'''
-MAZE_map_1way_endpts = '(1,1) (12,7)'
-
-MAZE_map_cs50ai = '''dfdfdfff9efd
-5f5f1acf5ff5
-386f5f1a4ff5
-f5ff5f5f5ff5
-f3a86f5f3aa6
-fff5ff5fffff
-baa6ff3aaaae'''
-MAZE_map_cs50ai_endpts = '(1,1) (12,7)'
-
-MAZE_map_nosoln = '''dfdfdf9a8efd
-5f5f1a4f5ff5
-386f5f1a6ff5
-f5ff5f5fdff5
-f3a86f5f3aa6
-fff5ff5fffff
-baa6ff3aaaae'''
-MAZE_map_nosoln_endpts = '(1,1) (12,7)'
-
-MAZE_map_ale04 = '''dfdfd9aa8efd
-5f5f12cf5ff5
-386f5f1a4ff5
-f5ff5f5f5ff5
-f3a86f5f3aa6
-fff5ff5fffff
-baa6ff3aaaae'''
-MAZE_map_ale04_endpts = '(12,1) (1,7)'
-
-def main():
-    # Just a testing routine
-    print('\nBuilding a 4x2 TEST maze (no way in)')
-    m = Maze(MAZE_test, MAZE_test_endpts)
-    m.print()
-
-    print('\nBuilding an 4x4 EMPTY maze (no way in)')
-    m = Maze(MAZE_empty, MAZE_empty_endpts)
-    m.print()
-
-    print('\nAnd print it again using a different form')
-    print(m)
-
-    print('\nBuilding a 6x5 BIG EMPTY maze (no way in)')
-    m = Maze(MAZE_big_empty, MAZE_big_empty_endpts)
-    m.print()
-
-    print(f'\nBuilding a 6x5 BIG maze')
-    m = Maze(MAZE_big, MAZE_big_endpts)
-    m.print()
-
-    print(f'\nBuilding a 6x5 BLACKHOLE maze')
-    m = Maze(MAZE_blackhole, MAZE_blackhole_endpts)
-    m.print()
-
-    print('\nBuilding a CITY maze with a FENCE')
-    m = Maze(MAZE_city_fence, MAZE_city_fence_endpts)
-    m.print()
-
-    print('\nBuilding a CITY maze')
-    m = Maze(MAZE_city, MAZE_city_endpts)
-    m.print()
-
-    print('\nBuilding a MAP for cs32')
-    m = Maze(MAZE_map, MAZE_map_endpts)
-    m.print()
-
-    print('\nBuilding a MAP for cs32 with 1-way')
-    m = Maze(MAZE_map_1way, MAZE_map_1way_endpts)
-    m.print()
-
-    print('\nBuilding the MAP from cs50ai')
-    m = Maze(MAZE_map_cs50ai, MAZE_map_cs50ai_endpts)
-    m.print()
-
-    print('\nBuilding a MAP without a solution')
-    m = Maze(MAZE_map_nosoln, MAZE_map_nosoln_endpts)
-    m.print()
+# The test mazes and the testing routine live in mazes.py, which we
+# import only when someone asks for them.  `maze.MAZE_map` and friends
+# still work, thanks to this module-level __getattr__.
+def __getattr__(name):
+    if name.startswith('MAZE_'):
+        import mazes
+        return getattr(mazes, name)
+    raise AttributeError(f"module 'maze' has no attribute '{name}'")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import mazes
+    mazes.main()
@@ -0,0 +1,254 @@
+### chap11/mazegen.py -- Procedurally generated mazes, cities, and warehouses
+import sys
+import random
+import maze
+
+# Each generator works on a flat bytearray of wall masks for the maze's
+# interior cells, using the same 4-bit encoding as the configuration
+# strings in maze.py.  Index gy * width + gx holds the cell at maze
+# location (gx+1, gy+1), so gy == 0 is the southmost row.  Only at the
+# end do we hand the rows, north row first, to the Maze constructor,
+# which lets us skip the hex-string parsing entirely.
+
+N, E, S, W = 0x8, 0x4, 0x2, 0x1
+ALL_WALLS = N | E | S | W
+OPPOSITE = {N: S, E: W, S: N, W: E}
+
+
+def _to_maze(walls, width, height, start, goal):
+    # Hand the wall masks to Maze, north row first
+    rows = [walls[gy * width:(gy + 1) * width]
+            for gy in range(height - 1, -1, -1)]
+    return maze.Maze(rows, (start, goal))
+
+def _neighbors(idx, width, height):
+    # Yields (wall, neighbor index) for each interior neighbor of idx
+    gx, gy = idx % width, idx // width
+    if gy < height - 1:
+        yield N, idx + width
+    if gx < width - 1:
+        yield E, idx + 1
+    if gy > 0:
+        yield S, idx - width
+    if gx > 0:
+        yield W, idx - 1
+
+def _knock_down(walls, idx, wall, nidx):
+    # Remove the wall between idx and its neighbor nidx from both sides
+    walls[idx] &= ~wall
+    walls[nidx] &= ~OPPOSITE[wall]
+
+def _block(walls, idx, width, height):
+    # Turn cell idx into a building that no one can enter or leave
+    walls[idx] = ALL_WALLS
+    for wall, nidx in _neighbors(idx, width, height):
+        walls[nidx] |= OPPOSITE[wall]
+
+def _perfect_endpts(walls, width, height):
+    # Open a door on the west side of the SW cell and on the east side
+    # of the NE cell, and use the border locations outside those doors
+    walls[0] &= ~W
+    walls[width * height - 1] &= ~E
+    return (0, 1), (width + 1, height)
+
+
+def backtracker(width, height, seed=None):
+    """Returns a random perfect maze (exactly one path between any two
+       cells) of the given size built by a recursive backtracker.  The
+       start is outside the SW corner and the goal outside the NE."""
+    assert width > 0 and height > 0
+    rng = random.Random(seed)
+    walls = bytearray([ALL_WALLS]) * (width * height)
+    visited = bytearray(width * height)
+
+    # An explicit stack keeps us clear of Python's recursion limit.
+    # The neighbor checks are inlined because this loop runs twice
+    # per cell.
+    visited[0] = 1
+    stack = [0]
+    rand = rng.random
+    while stack:
+        idx = stack[-1]
+        gx = idx % width
+        choices = []
+        if idx + width < width * height and not visited[idx + width]:
+            choices.append(N)
+        if gx < width - 1 and not visited[idx + 1]:
+            choices.append(E)
+        if idx >= width and not visited[idx - width]:
+            choices.append(S)
+        if gx > 0 and not visited[idx - 1]:
+            choices.append(W)
+        if not choices:
+            stack.pop()
+            continue
+        wall = choices[int(rand() * len(choices))]
+        if wall == N:
+            nidx = idx + width
+        elif wall == E:
+            nidx = idx + 1
+        elif wall == S:
+            nidx = idx - width
+        else:
+            nidx = idx - 1
+        _knock_down(walls, idx, wall, nidx)
+        visited[nidx] = 1
+        stack.append(nidx)
+
+    start, goal = _perfect_endpts(walls, width, height)
+    return _to_maze(walls, width, height, start, goal)
+
+
+def kruskal(width, height, seed=None):
+    """Returns a random perfect maze of the given size built with
+       Kruskal's algorithm.  Endpoints are placed as in backtracker."""
+    assert width > 0 and height > 0
+    rng = random.Random(seed)
+    walls = bytearray([ALL_WALLS]) * (width * height)
+
+    # Every interior wall, encoded as idx * 2 (east wall) or
+    # idx * 2 + 1 (north wall), in random order
+    edges = [idx * 2 for idx in range(width * height)
+             if idx % width < width - 1]
+    edges += [idx * 2 + 1 for idx in range(width * (height - 1))]
+    rng.shuffle(edges)
+
+    # Union-find over the cells with path halving
+    parent = list(range(width * height))
+
+    joins_left = width * height - 1
+    for e in edges:
+        idx = e >> 1
+        if e & 1:
+            wall, nidx = N, idx + width
+        else:
+            wall, nidx = E, idx + 1
+
+        # find(idx) and find(nidx), inlined for speed
+        a = idx
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        b = nidx
+        while parent[b] != b:
+            parent[b] = b = parent[parent[b]]
+
+        if a != b:
+            parent[a] = b
+            _knock_down(walls, idx, wall, nidx)
+            joins_left -= 1
+            if joins_left == 0:
+                break
+
+    start, goal = _perfect_endpts(walls, width, height)
+    return _to_maze(walls, width, height, start, goal)
+
+
+def city(blocks_wide, blocks_high, one_way=0.2, closed=0.05, seed=None):
+    """Returns a city laid out like CitySqGrid, but with blocks_wide by
+       blocks_high buildings, where each interior street segment is
+       one-way with probability `one_way` and closed with probability
+       `closed`.  The start is the intersection nearest the center.
+       There is no goal."""
+    assert blocks_wide > 1 and blocks_high > 1
+    rng = random.Random(seed)
+    width, height = 2 * blocks_wide - 1, 2 * blocks_high - 1
+
+    # Same pattern as CitySqGrid: buildings at odd (x,y), intersections
+    # at even (x,y), and street segments everywhere else
+    walls = bytearray(width * height)
+    for gy in range(height):
+        for gx in range(width):
+            x, y = gx + 1, gy + 1
+            if x % 2 and y % 2:
+                walls[gy * width + gx] = ALL_WALLS
+            elif x % 2:
+                walls[gy * width + gx] = N | S    # runs east-west
+            elif y % 2:
+                walls[gy * width + gx] = E | W    # runs north-south
+
+    for gy in range(height):
+        for gx in range(width):
+            x, y = gx + 1, gy + 1
+            if x % 2 == y % 2:
+                continue           # building or intersection
+            idx = gy * width + gx
+            r = rng.random()
+            if r < closed:
+                _block(walls, idx, width, height)
+                continue
+            if r >= closed + one_way:
+                continue
+
+            # One-way streets need an intersection at both ends, since
+            # a border cell takes its wall from the interior cell
+            if x % 2:
+                if x == 1 or x == width:
+                    continue
+                back, ahead = (W, idx + 1) if rng.random() < 0.5 \
+                              else (E, idx - 1)
+            else:
+                if y == 1 or y == height:
+                    continue
+                back, ahead = (S, idx + width) if rng.random() < 0.5 \
+                              else (N, idx - width)
+            # Travel only away from the `back` end: block leaving the
+            # segment toward `back`, and block entering it from the
+            # intersection `ahead`, whose `back` side faces the segment.
+            walls[idx] |= back
+            walls[ahead] |= back
+
+    cx = blocks_wide + blocks_wide % 2
+    cy = blocks_high + blocks_high % 2
+    return _to_maze(walls, width, height, (cx, cy), maze.NO_LOC)
+
+
+def warehouse(width, height, aisle=8, seed=None):
+    """Returns an open warehouse floor with rows of shelving.  Every
+       third row is shelving, broken by a cross aisle every `aisle`
+       columns and by a few random gaps.  The start is a door in the
+       SW corner and the goal is a door in the NE corner."""
+    assert width > 2 and height > 2 and aisle > 1
+    rng = random.Random(seed)
+
+    # An empty floor with outside walls only
+    walls = bytearray(width * height)
+    for gx in range(width):
+        walls[gx] |= S
+        walls[(height - 1) * width + gx] |= N
+    for gy in range(height):
+        walls[gy * width] |= W
+        walls[gy * width + width - 1] |= E
+
+    # Shelving, leaving a clear aisle along every outside wall
+    for gy in range(2, height - 2, 3):
+        for gx in range(1, width - 1):
+            if gx % aisle != 0 and rng.random() >= 0.02:
+                _block(walls, gy * width + gx, width, height)
+
+    walls[0] &= ~S
+    walls[width * height - 1] &= ~N
+    return _to_maze(walls, width, height, (1, 0), (width, height + 1))
+
+
+def main():
+    # Just a testing routine
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+
+    print('\nA 12x6 maze from the recursive backtracker')
+    m = backtracker(12, 6, seed)
+    print(m)
+
+    print('\nA 12x6 maze from Kruskal\'s algorithm')
+    m = kruskal(12, 6, seed)
+    print(m)
+
+    print('\nA 6x4 city with one-way streets and closures')
+    m = city(6, 4, seed=seed)
+    m.print()
+
+    print('\nA 20x10 warehouse floor')
+    m = warehouse(20, 10, seed=seed)
+    m.print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+### chap11/mazes.py -- Test mazes and the testing routine for maze.py
+import maze
+
+# Test mazes -- start/goal points stated as (x,y), where
+# we separate the two points with a space.  NOTE: There cannot
+# be a space inside the tuples!
+MAZE_test = '''988c
+3226'''
+MAZE_test_endpts = '(1,0) (0,1)'
+
+MAZE_empty = '''988c
+1004
+1004
+3226'''
+MAZE_empty_endpts = '(1,5) (4,0)'
+
+MAZE_big_empty = '''98888c
+100004
+100004
+100004
+322226'''
+MAZE_big_empty_endpts = '(0,1) (6,5)'
+
+MAZE_big = '''98888c
+100704
+100000
+100004
+122226'''
+MAZE_big_endpts = '(1,0) (7,3)'
+
+MAZE_blackhole = '''98888c
+104f14
+100800
+100004
+122226'''
+MAZE_blackhole_endpts = '(1,0) (7,3)'
+
+MAZE_city_fence = '''020202020
+4f5f5f5f1
+0a0a0a0a0
+4f5f5f5f1
+0a0a0a0a0
+4f5f5f5f1
+0a0a0a0a0
+4f5f5f5f1
+080808080'''
+MAZE_city_fence_endpts = '(5,5) (10,7)'
+
+MAZE_city = '''f5f5f5f
+a0a0a0a
+f5f5f5f
+a0a0a0a
+f5f5f5f
+a0a0a0a
+f5f5f5f'''
+MAZE_city_endpts = '(4,4) (8,6)'
+
+MAZE_map = '''dfdfdf9a8efd
+5f5f1a4f5ff5
+386f5f1a4ff5
+f5ff5f5f5ff5
+f3a86f5f3aa6
+fff5ff5fffff
+baa6ff3aaaae'''
+MAZE_map_endpts = '(1,1) (12,7)'
+
+MAZE_map_1way = '''dfdfdf9a8efd
+5f5f1acf5ff5
+386f5f1a4ff5
+f5ff5f5f5ff5
+f3a86f5f3aa6
+fff5ff5fffff
+baa6ff3aaaae'''
+MAZE_map_1way_endpts = '(1,1) (12,7)'
+
+MAZE_map_cs50ai = '''dfdfdfff9efd
+5f5f1acf5ff5
+386f5f1a4ff5
+f5ff5f5f5ff5
+f3a86f5f3aa6
+fff5ff5fffff
+baa6ff3aaaae'''
+MAZE_map_cs50ai_endpts = '(1,1) (12,7)'
+
+MAZE_map_nosoln = '''dfdfdf9a8efd
+5f5f1a4f5ff5
+386f5f1a6ff5
+f5ff5f5fdff5
+f3a86f5f3aa6
+fff5ff5fffff
+baa6ff3aaaae'''
+MAZE_map_nosoln_endpts = '(1,1) (12,7)'
+
+MAZE_map_ale04 = '''dfdfd9aa8efd
+5f5f12cf5ff5
+386f5f1a4ff5
+f5ff5f5f5ff5
+f3a86f5f3aa6
+fff5ff5fffff
+baa6ff3aaaae'''
+MAZE_map_ale04_endpts = '(12,1) (1,7)'
+
+def main():
+    # Just a testing routine
+    print('\nBuilding a 4x2 TEST maze (no way in)')
+    m = maze.Maze(MAZE_test, MAZE_test_endpts)
+    m.print()
+
+    print('\nBuilding an 4x4 EMPTY maze (no way in)')
+    m = maze.Maze(MAZE_empty, MAZE_empty_endpts)
+    m.print()
+
+    print('\nAnd print it again using a different form')
+    print(m)
+
+    print('\nBuilding a 6x5 BIG EMPTY maze (no way in)')
+    m = maze.Maze(MAZE_big_empty, MAZE_big_empty_endpts)
+    m.print()
+
+    print(f'\nBuilding a 6x5 BIG maze')
+    m = maze.Maze(MAZE_big, MAZE_big_endpts)
+    m.print()
+
+    print(f'\nBuilding a 6x5 BLACKHOLE maze')
+    m = maze.Maze(MAZE_blackhole, MAZE_blackhole_endpts)
+    m.print()
+
+    print('\nBuilding a CITY maze with a FENCE')
+    m = maze.Maze(MAZE_city_fence, MAZE_city_fence_endpts)
+    m.print()
+
+    print('\nBuilding a CITY maze')
+    m = maze.Maze(MAZE_city, MAZE_city_endpts)
+    m.print()
+
+    print('\nBuilding a MAP for cs32')
+    m = maze.Maze(MAZE_map, MAZE_map_endpts)
+    m.print()
+
+    print('\nBuilding a MAP for cs32 with 1-way')
+    m = maze.Maze(MAZE_map_1way, MAZE_map_1way_endpts)
+    m.print()
+
+    print('\nBuilding the MAP from cs50ai')
+    m = maze.Maze(MAZE_map_cs50ai, MAZE_map_cs50ai_endpts)
+    m.print()
+
+    print('\nBuilding a MAP without a solution')
+    m = maze.Maze(MAZE_map_nosoln, MAZE_map_nosoln_endpts)
+    m.print()
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
 ### chap11/pin.py
+import sys
+import io
+import csv
+import json
 import math
+from array import array
+from itertools import compress, repeat
 
 # Define useful pin icons and constants
 green_heart = '\u001b[32m\u2665\u001b[0m'
@@ -43,10 +49,164 @@ class Pin(object):
             return MAX_DISTANCE
 
 
-# Test the implementation of Pin using CitySqGrid
-from city import CitySqGrid
+# A pin's icon, indexed by its number of stars
+ICONS = (red_x,) * 3 + (green_heart,) * 3
+
+class PinStore(object):
+    """Abstraction: A PinStore holds many pins, column by column, so that
+       we can load, filter, and draw a very large number of them at once.
+
+       instance.[xs, ys]: The pins' x and y coordinates, in arrays.
+       instance.stars: The pins' ratings, in a bytearray.
+       instance.[names, notes]: The pins' names and notes, in lists of
+       interned strings (so repeated names are stored only once).
+
+       add(loc, name, note, stars): Adds a single pin.
+
+       extend(xs, ys, names, notes, stars): Adds a batch of pins given
+       as columns.  The ratings are validated once for the batch.  A bad
+       batch raises ValueError (or TypeError) and adds no pins at all.
+
+       store[i]: Returns pin i as a Pin object.
+
+       select(min_stars=0, max_stars=5, box=None): Returns a new
+       PinStore holding the pins rated between min_stars and max_stars
+       (inclusive) and, if box = (x0, y0, x1, y1) is given, whose
+       location is inside that box (inclusive).
+
+       mark(my_map): Puts every pin's icon on the maze my_map in a
+       single batch.
+
+       load_csv(path) and load_jsonl(path): Module-level functions that
+       return a new PinStore loaded from a file.
+    """
+    # Implementation details: Pin's rules live here too.  A pin must
+    # have 0-5 stars, and its icon depends only on its number of stars,
+    # so we look icons up in ICONS instead of storing them.
+
+    def __init__(self):
+        self.xs = array('i')
+        self.ys = array('i')
+        self.stars = bytearray()
+        self.names = []
+        self.notes = []
+
+    def __len__(self):
+        return len(self.stars)
+
+    def add(self, loc, name, note, stars):
+        self.extend((loc[0],), (loc[1],), (name,), (note,), (stars,))
+
+    def extend(self, xs, ys, names, notes, stars):
+        # Convert every column before touching any of ours, so that a
+        # bad batch leaves the store as it was
+        xs = array('i', xs)
+        ys = array('i', ys)
+        stars = bytearray(stars)   # raises ValueError if any are < 0
+        names = [sys.intern(name) for name in names]
+        notes = [sys.intern(note) for note in notes]
+        if len(stars) and max(stars) > 5:
+            raise ValueError('Invalid number of stars')
+        if not len(xs) == len(ys) == len(names) == len(notes) == len(stars):
+            raise ValueError('columns have different lengths')
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.stars.extend(stars)
+        self.names.extend(names)
+        self.notes.extend(notes)
+
+    def __getitem__(self, i):
+        return Pin((self.xs[i], self.ys[i]), self.names[i], self.notes[i],
+                   self.stars[i])
+
+    def select(self, min_stars=0, max_stars=5, box=None):
+        ok = [min_stars <= s <= max_stars for s in self.stars]
+        if box is not None:
+            x0, y0, x1, y1 = box
+            ok = [k and x0 <= x <= x1 and y0 <= y <= y1
+                  for k, x, y in zip(ok, self.xs, self.ys)]
+        subset = PinStore()
+        subset.xs.extend(compress(self.xs, ok))
+        subset.ys.extend(compress(self.ys, ok))
+        subset.stars.extend(compress(self.stars, ok))
+        subset.names.extend(compress(self.names, ok))
+        subset.notes.extend(compress(self.notes, ok))
+        return subset
+
+    def mark(self, my_map):
+        my_map.mark_many(self.xs, self.ys, [ICONS[s] for s in self.stars])
+
+
+def load_csv(path):
+    """Returns a PinStore loaded from a CSV file with the header row
+       x,y,name,note,stars.  Blank lines are skipped.  Raises ValueError,
+       naming the line, if any row doesn't have exactly 5 fields."""
+    with open(path, newline='') as f:
+        text = f.read()
+
+    def bad_row(line_num, nfields):
+        return ValueError(f'{path}, line {line_num}: expected 5 fields, '
+                          f'got {nfields}')
+
+    if '"' in text:
+        # Quoted fields may hold commas or newlines, so let csv sort
+        # them out and then turn its rows into columns
+        reader = csv.reader(io.StringIO(text))
+        header = next(reader, [])
+        columns = ([], [], [], [], [])
+        for row in reader:
+            if not row:
+                continue                   # blank line
+            if len(row) != 5:
+                raise bad_row(reader.line_num, len(row))
+            for column, field in zip(columns, row):
+                column.append(field)
+    else:
+        # Fast path: with no quoting, every field ends at a comma or a
+        # newline.  Once we know every row has exactly 4 commas, one
+        # split gives us all the fields in order and each column is
+        # every fifth field.
+        lines = text.replace('\r\n', '\n').split('\n')
+        header = lines[0].split(',')
+        rows = [line for line in lines[1:] if line != '']
+        if set(map(str.count, rows, repeat(','))) - {4}:
+            for line_num, line in enumerate(lines[1:], 2):
+                if line != '' and line.count(',') != 4:
+                    raise bad_row(line_num, line.count(',') + 1)
+        fields = ','.join(rows).split(',') if rows else []
+        columns = [fields[k::5] for k in range(5)]
+    if header != ['x', 'y', 'name', 'note', 'stars']:
+        raise ValueError(f'{path}: unexpected header {header}')
+
+    store = PinStore()
+    xs, ys, names, notes, stars = columns
+    store.extend(array('i', map(int, xs)), array('i', map(int, ys)),
+                 names, notes, map(int, stars))
+    return store
+
+def load_jsonl(path):
+    """Returns a PinStore loaded from a JSON Lines file, where each line
+       looks like {"loc": [3, 11], "name": ..., "note": ..., "stars": 5}"""
+    xs, ys, names, notes, stars = [], [], [], [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip() == '':
+                continue
+            p = json.loads(line)
+            xs.append(p['loc'][0])
+            ys.append(p['loc'][1])
+            names.append(p['name'])
+            notes.append(p['note'])
+            stars.append(p['stars'])
+    store = PinStore()
+    store.extend(xs, ys, names, notes, stars)
+    return store
+
 
 def main():
+    # Test the implementation of Pin using CitySqGrid
+    from city import CitySqGrid
+
     # Our faithful dog
     Cosmo = '\N{DOG FACE}'
 
@@ -82,5 +242,15 @@ def main():
     dist = pin1.distance(nyc.start)
     print(f"Pin {pin1.loc} is {dist} units away")
 
+    # Keep the same pins in a PinStore and draw only the good ones
+    store = PinStore()
+    for pin in pins:
+        store.add(pin.loc, pin.name, pin.note, pin.stars)
+    good = store.select(min_stars=3)
+    print(f'{len(good)} of {len(store)} pins have 3 or more stars')
+    nyc.reset()
+    good.mark(nyc)
+    print(nyc)
+
 if __name__ == '__main__':
     main()
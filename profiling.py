@@ -0,0 +1,192 @@
+### chap11/profiling.py -- Phase timers and a sampling profiler
+import os
+import sys
+import time
+
+# Our scripts all do the same few things: build a map, reset it, walk
+# or search it, and render it.  A PhaseTimer adds up the time spent in
+# each of those phases.  Timing a phase costs two perf_counter_ns calls
+# and a dictionary update, so scripts leave the timers on all the time
+# and print them only when asked.
+#
+# The Sampler finds the hot functions within a phase.  It asks the OS
+# for a SIGPROF signal every `interval` seconds of CPU time, and the
+# handler records the Python stack it interrupted.  The samples are
+# written in the "collapsed stack" format that flamegraph.pl and
+# speedscope read: one line per distinct stack, outermost frame first,
+# frames separated by ';', then a space and the number of samples.
+# Importing signal costs several milliseconds, so only the Sampler
+# does it, and only when it starts.
+
+class PhaseTimer(object):
+    """Abstraction: A PhaseTimer totals the time spent in named phases.
+
+       phase(name): Returns a context manager that adds the time spent
+       inside its `with` block to phase name.  Phases with different
+       names may nest; a phase may not nest inside itself.
+
+       instance.[totals, counts]: Dictionaries mapping each phase name
+       to its total nanoseconds and the number of times it ran.
+
+       report(): Returns a table of the phases as a string.
+    """
+    # Implementation details: phase() hands out one reusable _Phase per
+    # name, so timing a phase allocates nothing after its first use.
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.phases = {}
+
+    def phase(self, name):
+        p = self.phases.get(name)
+        if p is None:
+            p = self.phases[name] = _Phase(self, name)
+            self.totals[name] = 0
+            self.counts[name] = 0
+        return p
+
+    def report(self):
+        total = sum(self.totals.values()) or 1
+        lines = [f'{"phase":<10} {"calls":>8} {"total ms":>10} '
+                 f'{"per call us":>12} {"share":>6}']
+        for name, ns in sorted(self.totals.items(), key=lambda kv: -kv[1]):
+            calls = self.counts[name]
+            lines.append(f'{name:<10} {calls:>8} {ns / 1e6:>10.2f} '
+                         f'{ns / 1e3 / max(calls, 1):>12.1f} '
+                         f'{100 * ns / total:>5.1f}%')
+        return '\n'.join(lines)
+
+class _Phase(object):
+    __slots__ = ('timer', 'name', 't0')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.t0 = 0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        ns = time.perf_counter_ns() - self.t0
+        self.timer.totals[self.name] += ns
+        self.timer.counts[self.name] += 1
+        return False
+
+
+class Sampler(object):
+    """Abstraction: A Sampler records the Python stack at regular
+       intervals of CPU time while it is running.  Needs a system with
+       signal.setitimer (not Windows).
+
+       start() and stop(): Turn sampling on and off.
+
+       instance.samples: Dictionary mapping each collapsed stack
+       string to its number of samples.
+
+       write(path): Writes the samples as a collapsed-stack file.
+    """
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = {}
+        self.old_handler = None
+
+    def __sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{os.path.basename(code.co_filename)}:'
+                         f'{code.co_name}')
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        import signal
+        self.old_handler = signal.signal(signal.SIGPROF, self.__sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        import signal
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.old_handler or signal.SIG_DFL)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f'{stack} {count}\n')
+
+
+class Profile(object):
+    """Abstraction: A Profile is what a script uses to support a
+       `--profile` command-line option.
+
+       Profile(argv): Removes `--profile` or `--profile=PATH` from the
+       list argv (normally sys.argv), so the script can go on parsing
+       its arguments as before.  If it was there, starts a Sampler.
+
+       instance.enabled: True if `--profile` was given.
+
+       phase(name): Same as PhaseTimer.phase; always on.
+
+       finish(): If enabled, stops sampling, writes the samples to PATH
+       (default: the script's name with the extension .collapsed), and
+       prints the phase timings to stderr.
+    """
+    def __init__(self, argv):
+        self.enabled = False
+        self.path = os.path.splitext(os.path.basename(argv[0]))[0] + \
+                    '.collapsed'
+        for arg in argv[1:]:
+            if arg == '--profile' or arg.startswith('--profile='):
+                self.enabled = True
+                if '=' in arg:
+                    self.path = arg.split('=', 1)[1]
+                argv.remove(arg)
+                break
+
+        self.timer = PhaseTimer()
+        self.phase = self.timer.phase
+        self.sampler = None
+        if self.enabled:
+            import signal
+            if hasattr(signal, 'setitimer'):
+                self.sampler = Sampler()
+                self.sampler.start()
+
+    def finish(self):
+        if not self.enabled:
+            return
+        print(self.timer.report(), file=sys.stderr)
+        if self.sampler is None:
+            print('No sampling on this system', file=sys.stderr)
+            return
+        self.sampler.stop()
+        self.sampler.write(self.path)
+        print(f'Wrote {sum(self.sampler.samples.values())} samples to '
+              f'{self.path}', file=sys.stderr)
+
+
+def main():
+    # Just a testing routine
+    prof = Profile(sys.argv + ['--profile=profiling.collapsed'])
+    for _ in range(3):
+        with prof.phase('busy'):
+            sum(i * i for i in range(300000))
+        with prof.phase('idle'):
+            time.sleep(0.01)
+
+    # How much does an unused phase cost?
+    timer = PhaseTimer()
+    n = 100000
+    t = time.perf_counter()
+    for _ in range(n):
+        with timer.phase('x'):
+            pass
+    print(f'{1e9 * (time.perf_counter() - t) / n:.0f} ns per phase')
+    prof.finish()
+
+if __name__ == '__main__':
+    main()
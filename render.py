@@ -0,0 +1,52 @@
+### chap11/render.py -- Redraw only what changed in a terminal maze
+import sys
+
+class TermRenderer(object):
+    """Abstraction: A TermRenderer draws a Maze on an ANSI terminal.
+       The first call to draw() clears the screen and prints the whole
+       maze, just like print(maze).  Later calls redraw only the lines
+       holding locations that were marked since the previous draw(),
+       or repaint everything if the maze's walls have been edited.
+
+       draw(): Brings the screen up to date with the maze and leaves
+       the cursor on the line below the maze, ready for a prompt.
+
+       redraw(): Forces the next draw() to repaint everything.
+    """
+    # Implementation details: We rely on Maze.mark adding each location
+    # it changes to my_map.dirty, and we empty that set after each draw.
+    # Grid row j's contents appear on screen line 2*(height+1-j) + 1,
+    # because __str__ prints the north border first and a line of wall
+    # characters after every row but the south border.
+    #
+    # We repaint a changed row's whole line rather than a single cell.
+    # Cell contents like the dog emoji are two columns wide, and the
+    # full print() shifts the rest of that line to the right, so the
+    # screen column of a cell depends on everything to its left.  The
+    # cost per move is still O(width) instead of O(width * height).
+
+    def __init__(self, my_map, out=sys.stdout):
+        self.map = my_map
+        self.out = out
+        self.__fresh = True
+        self.__version = my_map.version
+
+    def redraw(self):
+        self.__fresh = True
+
+    def draw(self):
+        m = self.map
+        if self.__fresh or self.__version != m.version:
+            self.out.write('\033[H\033[2J' + str(m))
+            self.__fresh = False
+            self.__version = m.version
+        else:
+            for j in sorted({y for (x, y) in m.dirty}):
+                line = 2 * (m.height + 1 - j) + 1
+                self.out.write(f'\033[{line};1H' + m.row_str(j) + '\033[K')
+        m.dirty.clear()
+
+        # Park the cursor below the maze (leaving one blank line, as
+        # print(maze) does) and clear whatever was written there
+        self.out.write(f'\033[{2 * m.height + 5};1H\033[J')
+        self.out.flush()
@@ -0,0 +1,113 @@
+### chap11/route.py -- A compact, run-length encoded route
+from array import array
+import maze
+
+NAMES = ('north', 'east', 'south', 'west')   # by maze direction code
+
+class Route(object):
+    """Abstraction: A Route is a start location followed by a sequence
+       of moves.  Runs of moves in the same direction are stored once
+       with a count, so "n, n, n, e" is kept as "n×3, e×1".
+
+       instance.start: The location where the route starts.
+
+       append(action, count=1): Adds `count` moves in the direction
+       `action` (only its first letter matters) to the end of the route.
+
+       runs(): Yields (action, count) pairs, one per run.
+
+       instructions(): Yields one line of turn-by-turn directions per
+       run.
+
+       end(): Returns the location where the route ends.
+
+       len(route) is the number of moves, and iterating over a route
+       yields its moves one at a time.
+    """
+    # Implementation details: self.dirs holds each run's direction code
+    # and self.counts the length of that run, both as arrays, so a long
+    # route costs a few bytes per turn rather than an object per move.
+
+    def __init__(self, start, actions=()):
+        self.start = start
+        self.dirs = array('B')
+        self.counts = array('L')
+        for a in actions:
+            self.append(a)
+
+    def append(self, action, count=1):
+        code = maze.DIR_CODES[action[0].lower()]
+        if len(self.dirs) > 0 and self.dirs[-1] == code:
+            self.counts[-1] += count
+        else:
+            self.dirs.append(code)
+            self.counts.append(count)
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def __iter__(self):
+        for code, count in zip(self.dirs, self.counts):
+            for _ in range(count):
+                yield maze.DIRECTIONS[code]
+
+    def runs(self):
+        for code, count in zip(self.dirs, self.counts):
+            yield maze.DIRECTIONS[code], count
+
+    def __str__(self):
+        return ', '.join(f'{a}×{n}' for a, n in self.runs())
+
+    def instructions(self):
+        prev = None
+        for code, count in zip(self.dirs, self.counts):
+            steps = f'{count} step' + ('s' if count > 1 else '')
+            if prev is None:
+                yield f'Head {NAMES[code]} for {steps}'
+            else:
+                turn = (code - prev) % 4
+                if turn == 1:
+                    how = 'Turn right'
+                elif turn == 3:
+                    how = 'Turn left'
+                else:
+                    how = 'Turn around'
+                yield f'{how} and go {NAMES[code]} for {steps}'
+            prev = code
+
+    def end(self):
+        x, y = self.start
+        for code, count in zip(self.dirs, self.counts):
+            if code == maze.NORTH:
+                y += count
+            elif code == maze.EAST:
+                x += count
+            elif code == maze.SOUTH:
+                y -= count
+            else:
+                x -= count
+        return (x, y)
+
+
+def from_note(note):
+    """Given the final note of a search tree (any object with `state`,
+       `parent`, and `action` attributes), follow its parent links back
+       to the root and return the route from the root to it"""
+    actions = []
+    while note.parent:
+        actions.append(note.action)
+        note = note.parent
+    actions.reverse()
+    return Route(note.state, actions)
+
+
+def main():
+    # Just a testing routine
+    r = Route((1, 1), 'eeennennneeseesseeennnn')
+    print(f'Route from {r.start} to {r.end()} in {len(r)} moves: {r}')
+    for line in r.instructions():
+        print(line)
+    assert ''.join(r) == 'eeennennneeseesseeennnn'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+### chap11/router.py -- An asyncio routing service for our maps
+import sys
+import json
+import asyncio
+import concurrent.futures
+import multiprocessing
+import bfs
+import maze
+import mazes
+
+# Usage:
+#   python3 router.py           read JSON requests from stdin
+#   python3 router.py PORT      serve JSON requests on 127.0.0.1:PORT
+#
+# Each request is a single line of JSON, for example
+#   {"id": 1, "map": "map_1way", "start": [1,1], "goal": [12,7]}
+# where "map" names one of the MAZE_* maps in mazes.py (with or without
+# the MAZE_ prefix).  The "start" and "goal" fields are optional and
+# default to the map's own endpoints.  Instead of "goal", a request may
+# give a list of "goals", or set "goals" to "exits" to mean every border
+# location; the answer then also says which "goal" is nearest.  A goal
+# walled off on every side, like a pin inside a building, can't be
+# reached unless the request also sets "adjacent" to true.  Then a
+# route may end at an open cell beside the goal, and the answer always
+# says which "goal" the route reaches or ends beside.  Each
+# answer is a single line of JSON carrying the same "id" and either a
+# "route" or an "error".
+
+def load_maps():
+    """Builds every MAZE_* map in mazes.py and returns them in a
+       dictionary keyed by the map's name without the MAZE_ prefix."""
+    maps = {}
+    for name in dir(mazes):
+        if name.startswith('MAZE_') and not name.endswith('_endpts'):
+            cells = getattr(mazes, name)
+            endpts = getattr(mazes, name + '_endpts')
+            maps[name[len('MAZE_'):]] = maze.Maze(cells, endpts)
+    return maps
+
+
+# Each worker process loads the maps once, when the pool starts it
+_worker_maps = None
+
+def _init_worker():
+    global _worker_maps
+    _worker_maps = load_maps()
+
+def _route(map_name, start, goals, adjacent):
+    # Runs in a worker process
+    return bfs.nearest_goal(_worker_maps[map_name], start, goals,
+                            adjacent=adjacent)
+
+
+class Router(object):
+    """Abstraction: A Router answers route requests against a fixed
+       set of maps.  Searches run in a pool of worker processes, so a
+       slow search doesn't hold up the answers to quick ones.
+
+       handle(line): Coroutine that takes one JSON request line and
+       returns the JSON answer line.  It never raises: any failure,
+       even of the worker pool, becomes the answer's "error".
+
+       close(): Shuts down the worker pool.
+    """
+    # Implementation details: self.inflight maps a request key
+    # (map, start, goals, adjacent) to the asyncio future computing it, so
+    # concurrent identical requests share a single search.  The pool
+    # uses the 'spawn' start method so that its workers, which start
+    # lazily, don't inherit (and hold open) our client sockets.
+
+    def __init__(self, workers=None):
+        self.maps = load_maps()
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            mp_context=multiprocessing.get_context('spawn'))
+        self.inflight = {}
+
+    def __parse(self, request):
+        # Hidden helper for handle that checks a request and fills in
+        # its defaults.  Returns the request key.
+        name = request['map']
+        if name.startswith('MAZE_'):
+            name = name[len('MAZE_'):]
+        if name not in self.maps:
+            raise ValueError(f'unknown map {request["map"]}')
+        my_map = self.maps[name]
+        start = tuple(request.get('start', my_map.start))
+        if request.get('goals') == 'exits':
+            goals = bfs.exits(my_map)
+        elif 'goals' in request:
+            goals = [tuple(g) for g in request['goals']]
+        else:
+            goals = [tuple(request.get('goal', my_map.goal))]
+        for pt in [start] + goals:
+            if len(pt) != 2 or not (0 <= pt[0] < my_map.width + 2 and
+                                    0 <= pt[1] < my_map.height + 2):
+                raise ValueError(f'bad location {list(pt)}')
+        adjacent = request.get('adjacent', False)
+        if not isinstance(adjacent, bool):
+            raise ValueError('"adjacent" must be true or false')
+        return (name, start, tuple(sorted(set(goals))), adjacent)
+
+    async def route(self, name, start, goals, adjacent=False):
+        """Returns the nearest goal and the actions of the shortest
+           route to it, or (None, None)"""
+        key = (name, start, goals, adjacent)
+        fut = self.inflight.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self.pool, _route, *key)
+            self.inflight[key] = fut
+            fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    async def handle(self, line):
+        answer = {}
+        try:
+            request = json.loads(line)
+            answer['id'] = request.get('id')
+            key = self.__parse(request)
+            goal, actions = await self.route(*key)
+            if actions is None:
+                answer['error'] = 'no solution'
+            else:
+                if 'goals' in request or key[3]:
+                    answer['goal'] = list(goal)
+                answer['route'] = ''.join(actions)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            answer['error'] = str(e)
+        except Exception as e:      # say a worker died: still answer
+            answer['error'] = f'{type(e).__name__}: {e}'
+        return json.dumps(answer)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+async def serve_stdin(router):
+    """Answers requests read from stdin until end of file"""
+    loop = asyncio.get_running_loop()
+    pending = set()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if line == '':
+            break
+        if line.strip() == '':
+            continue
+        task = asyncio.create_task(router.handle(line))
+        task.add_done_callback(lambda t: print(t.result(), flush=True))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+
+
+async def serve_socket(router, port):
+    """Answers requests on a local TCP socket, one per line"""
+    async def client(reader, writer):
+        lock = asyncio.Lock()
+
+        async def answer(line):
+            reply = await router.handle(line)
+            async with lock:
+                writer.write(reply.encode() + b'\n')
+                await writer.drain()
+
+        tasks = set()
+        while line := await reader.readline():
+            if line.strip() == b'':
+                continue
+            task = asyncio.create_task(answer(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        writer.close()
+
+    server = await asyncio.start_server(client, '127.0.0.1', port)
+    print(f'Routing on 127.0.0.1:{port}', file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python3 router.py [port]")
+
+    router = Router()
+    try:
+        if len(sys.argv) == 2:
+            asyncio.run(serve_socket(router, int(sys.argv[1])))
+        else:
+            asyncio.run(serve_stdin(router))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        router.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+### chap11/searchtrace.py -- Record a search and replay it offline
+import sys
+import struct
+from array import array
+
+# To watch a search, we used to print the whole map after every step.
+# A SearchTrace instead records just enough to redraw the search later,
+# from the saved file, so that we can leave it on for real queries on
+# big maps.  While searching, the only cost is one list append per
+# cell the search expands (takes off its frontier).  When the search
+# ends, it hands us its parent list, where parent[cid] is the cell id from
+# which it discovered cell cid (the start is its own parent, and -1
+# means never discovered).  That is enough to rebuild the rest: the
+# cells that joined the frontier when cell c was expanded are exactly
+# the cells whose parent is c.
+#
+# replay() rebuilds the full list of events, each one packed into a
+# single int, cell_id * 4 + event, which is what the exporters draw.
+#
+# A trace file is a little-endian header, struct '<4s6i': the magic
+# bytes, the map's width and height, the number of expanded cells, the
+# goal's cell id (or -1), the length of the parent array, and the
+# number of wall bytes.  Then come the expanded cells and the parent
+# array as int32s, and the map's wall masks (see Maze.wall_masks), one
+# byte per cell id.
+
+EXPAND, FRONTIER, GOAL = 0, 1, 2
+MAGIC = b'TRC2'
+HEADER = struct.Struct('<4s6i')
+
+class SearchTrace(object):
+    """Abstraction: A SearchTrace records one search over a maze.
+
+       SearchTrace(my_map): An empty trace of a search over my_map.
+
+       instance.events: The list of cell ids the search expanded, in
+       order.  A search records expanding cell cid by appending cid,
+       including when cid is the goal.
+
+       finish(parent, goal=-1): Called once by the search when it ends,
+       with its parent list and the cell id of the goal it reached.  The
+       trace keeps parent as it is, without copying it.
+
+       instance.[width, height]: The map's size.
+
+       replay(): Returns every event of the search, in order, as an
+       array('i') of cid * 4 + e, where e is EXPAND, FRONTIER, or GOAL.
+
+       save(path): Writes the trace and the map's walls to a file.
+
+       load(path), export_html(...), and export_gif(...): Module-level
+       functions that read a trace back and draw it.
+    """
+    # Implementation details: events and parent stay plain lists until
+    # we save them, since converting a big map's parent list to an
+    # array would cost about as much as the search.  A cell can be
+    # expanded more than once by a search that doesn't check its
+    # frontier for repeats; replay() adds the children of a cell to the
+    # frontier only the first time.
+
+    def __init__(self, my_map=None):
+        self.my_map = my_map
+        self.events = []
+        self.parent = []
+        self.goal = -1
+        self.walls = None
+        if my_map is not None:
+            self.width = my_map.width
+            self.height = my_map.height
+
+    def __len__(self):
+        return len(self.events)
+
+    def finish(self, parent, goal=-1):
+        self.parent = parent
+        self.goal = goal
+
+    def wall_masks(self):
+        if self.walls is None:
+            self.walls = self.my_map.wall_masks()
+        return self.walls
+
+    def replay(self):
+        children = {}
+        roots = []
+        for cid, p in enumerate(self.parent):
+            if p == cid:
+                roots.append(cid)
+            elif p != -1:
+                children.setdefault(p, []).append(cid)
+
+        out = array('i', (cid * 4 + FRONTIER for cid in roots))
+        last = len(self.events) - 1
+        for i, cid in enumerate(self.events):
+            if i == last and cid == self.goal:
+                out.append(cid * 4 + GOAL)
+                break
+            out.append(cid * 4 + EXPAND)
+            for child in children.pop(cid, ()):
+                out.append(child * 4 + FRONTIER)
+        return out
+
+    def save(self, path):
+        events = array('i', self.events)
+        parent = array('i', self.parent)
+        if sys.byteorder == 'big':
+            events.byteswap()
+            parent.byteswap()
+        walls = self.wall_masks()
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.width, self.height, len(events),
+                                self.goal, len(parent), len(walls)))
+            f.write(events.tobytes())
+            f.write(parent.tobytes())
+            f.write(walls)
+
+
+def load(path):
+    """Returns the SearchTrace saved in the file at path"""
+    with open(path, 'rb') as f:
+        magic, width, height, count, goal, nparent, nwalls = HEADER.unpack(
+            f.read(HEADER.size))
+        assert magic == MAGIC, f'{path} is not a search trace'
+        trace = SearchTrace()
+        trace.width, trace.height = width, height
+        trace.goal = goal
+        events = array('i', f.read(4 * count))
+        parent = array('i', f.read(4 * nparent))
+        if sys.byteorder == 'big':
+            events.byteswap()
+            parent.byteswap()
+        trace.events, trace.parent = events.tolist(), parent.tolist()
+        trace.walls = bytearray(f.read(nwalls))
+    return trace
+
+
+# The HTML export is one self-contained file.  The replayed events and
+# the walls go in as base64, and a little JavaScript draws frame k (the
+# first k events) on a canvas, with a slider and a play button.
+_HTML = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s</title></head>
+<body style="font-family: sans-serif">
+<h3>%(title)s</h3>
+<canvas id="play"></canvas><br>
+<button id="go">Play</button>
+<input id="k" type="range" min="0" value="0" style="width: 60%%">
+<span id="label"></span>
+<div id="frames"></div>
+<script>
+const T = %(data)s;
+const bytes = s => Uint8Array.from(atob(s), c => c.charCodeAt(0));
+const ev = new Int32Array(bytes(T.events).buffer);
+const walls = bytes(T.walls);
+const H2 = T.height + 2, W2 = T.width + 2;
+const S = Math.max(2, Math.min(16, Math.floor(800 / Math.max(W2, H2))));
+const COLORS = ['#3b6fd4', '#45b549', '#d8412f'];
+
+function draw(canvas, k) {
+  canvas.width = W2 * S; canvas.height = H2 * S;
+  const g = canvas.getContext('2d');
+  g.fillStyle = '#fff'; g.fillRect(0, 0, canvas.width, canvas.height);
+  for (let i = 0; i < k; i++) {
+    const cid = ev[i] >> 2, x = Math.floor(cid / H2), y = cid %% H2;
+    g.fillStyle = COLORS[ev[i] & 3];
+    g.fillRect(x * S, (H2 - 1 - y) * S, S, S);
+  }
+  g.strokeStyle = '#000'; g.beginPath();
+  for (let cid = 0; cid < walls.length; cid++) {
+    const m = walls[cid], x = Math.floor(cid / H2) * S,
+          y = (H2 - 1 - cid %% H2) * S;
+    if (m & 8) { g.moveTo(x, y); g.lineTo(x + S, y); }
+    if (m & 4) { g.moveTo(x + S, y); g.lineTo(x + S, y + S); }
+    if (m & 2) { g.moveTo(x, y + S); g.lineTo(x + S, y + S); }
+    if (m & 1) { g.moveTo(x, y); g.lineTo(x, y + S); }
+  }
+  g.stroke();
+}
+
+const play = document.getElementById('play');
+const k = document.getElementById('k');
+const label = document.getElementById('label');
+k.max = ev.length;
+const show = () => { draw(play, +k.value);
+                     label.textContent = k.value + ' / ' + ev.length; };
+k.oninput = show;
+let timer = null;
+document.getElementById('go').onclick = () => {
+  if (timer) { clearInterval(timer); timer = null; return; }
+  if (+k.value >= ev.length) k.value = 0;
+  const step = Math.max(1, Math.ceil(ev.length / 300));
+  timer = setInterval(() => {
+    k.value = Math.min(ev.length, +k.value + step); show();
+    if (+k.value >= ev.length) { clearInterval(timer); timer = null; }
+  }, 30);
+};
+for (const f of T.frames) {
+  const c = document.createElement('canvas');
+  const d = document.createElement('div');
+  d.textContent = 'After ' + f + ' events';
+  document.getElementById('frames').append(d, c);
+  draw(c, f);
+}
+k.value = ev.length; show();
+</script></body></html>
+'''
+
+
+def export_html(trace, path, frames=(), title='Search trace'):
+    """Writes an HTML page that replays the trace on a canvas, and also
+       shows a still picture after each number of events in frames"""
+    import html
+    import json
+    import base64
+    events = trace.replay()
+    if sys.byteorder == 'big':
+        events.byteswap()
+    data = {'width': trace.width, 'height': trace.height,
+            'events': base64.b64encode(events.tobytes()).decode(),
+            'walls': base64.b64encode(trace.wall_masks()).decode(),
+            'frames': [min(f, len(events)) for f in frames]}
+    with open(path, 'w') as f:
+        f.write(_HTML % {'title': html.escape(title),
+                         'data': json.dumps(data).replace('<', '\\u003c')})
+
+def _image(trace, events, k, scale):
+    # Draws the first k events with Pillow, in the HTML page's colors
+    from PIL import Image, ImageDraw
+    h2, w2 = trace.height + 2, trace.width + 2
+    img = Image.new('RGB', (w2 * scale, h2 * scale), 'white')
+    g = ImageDraw.Draw(img)
+    colors = ('#3b6fd4', '#45b549', '#d8412f')
+    for e in events[:k]:
+        cid = e >> 2
+        x, y = cid // h2 * scale, (h2 - 1 - cid % h2) * scale
+        g.rectangle([x, y, x + scale - 1, y + scale - 1], fill=colors[e & 3])
+    for cid, m in enumerate(trace.wall_masks()):
+        x, y = cid // h2 * scale, (h2 - 1 - cid % h2) * scale
+        if m & 8:
+            g.line([x, y, x + scale, y], fill='black')
+        if m & 4:
+            g.line([x + scale, y, x + scale, y + scale], fill='black')
+        if m & 2:
+            g.line([x, y + scale, x + scale, y + scale], fill='black')
+        if m & 1:
+            g.line([x, y, x, y + scale], fill='black')
+    return img
+
+def export_gif(trace, path, frames, scale=8, ms=100):
+    """Writes an animated GIF (or, for a path ending in .png, a single
+       PNG) showing the trace after each number of events in frames.
+       Needs Pillow."""
+    events = trace.replay()
+    images = [_image(trace, events, k, scale) for k in frames]
+    if path.lower().endswith('.png'):
+        images[-1].save(path)
+    else:
+        images[0].save(path, save_all=True, append_images=images[1:],
+                       duration=ms, loop=0)
+
+
+def main():
+    # Just a testing routine
+    import os
+    import time
+    import tempfile
+    import mazegen
+    import bfs
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    my_map = mazegen.kruskal(size, size, seed=45)
+    start, goal = my_map.start, my_map.goal
+
+    # Best of several rounds, since the difference is small
+    plain = traced = float('inf')
+    for _ in range(7):
+        t = time.perf_counter()
+        for _ in range(20):
+            bfs.nearest_goal(my_map, start, [goal])
+        plain = min(plain, time.perf_counter() - t)
+        t = time.perf_counter()
+        for _ in range(20):
+            trace = SearchTrace(my_map)
+            bfs.nearest_goal(my_map, start, [goal], trace)
+        traced = min(traced, time.perf_counter() - t)
+    events = trace.replay()
+    print(f'{len(trace)} cells expanded, {len(events)} events; recording '
+          f'costs {100 * (traced - plain) / plain:+.0f}%')
+
+    # The replayed events match what the search did, step by step
+    assert events[0] == my_map.cell_id(start) * 4 + FRONTIER
+    assert events[-1] == my_map.cell_id(goal) * 4 + GOAL
+    assert [e >> 2 for e in events if e & 3 != FRONTIER] == \
+        list(trace.events)
+
+    out = tempfile.mkdtemp(prefix='searchtrace-')
+    trace.save(os.path.join(out, 'search.trace'))
+    again = load(os.path.join(out, 'search.trace'))
+    assert again.events == trace.events and again.parent == trace.parent \
+        and again.goal == trace.goal and again.walls == trace.walls
+    n = len(events)
+    export_html(again, os.path.join(out, 'search.html'),
+                frames=[n // 4, n // 2, n], title=f'Kruskal <{size}>')
+    print(f'Wrote search.trace and search.html in {out}')
+    try:
+        export_gif(again, os.path.join(out, 'search.gif'),
+                   [n * i // 20 for i in range(21)])
+        print('Wrote search.gif')
+    except ImportError:
+        print('No Pillow, so no GIF')
+
+if __name__ == '__main__':
+    main()
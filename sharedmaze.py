@@ -0,0 +1,161 @@
+### chap11/sharedmaze.py -- A read-only maze that processes can share
+import sys
+from array import array
+import multiprocessing
+from multiprocessing import shared_memory
+import maze
+
+class SharedMaze(object):
+    """Abstraction: A SharedMaze is a read-only, compiled copy of a
+       Maze's walls and move table that lives in shared memory.  One
+       process publishes it and any number of worker processes attach
+       to it without copying the grid.
+
+       instance.spec: A small, picklable tuple that names the shared
+       memory.  Send it to a worker and call SharedMaze(spec) there.
+
+       instance.[width, height, start, goal]: As in class Maze.
+
+       instance.walls: Read-only bytes of wall masks, by cell id.
+
+       instance.moves: Read-only move table, as in class Maze.
+
+       scratch(): Returns a zeroed bytearray with one byte per cell,
+       which a worker can use as its per-query visited marks.
+
+       cell_id(location), location(cid), move_id(cid, code),
+       simulate_move(location, direction), possible_moves(location,
+       visited): Like the Maze methods, except that nothing is ever
+       marked in the maze.  Instead, possible_moves skips cells whose
+       byte in the `visited` scratch array is nonzero.
+
+       close(): Detaches from the shared memory.
+
+       unlink(): Frees the shared memory.  Only the publisher should
+       call it, once all the workers are done.
+    """
+    # Implementation details: The shared block holds the move table as
+    # 4-byte ints (4 per cell) followed by the wall masks (1 per cell).
+    # We never build a per-cell list of location tuples in the workers,
+    # so locations are recomputed from cell ids with divmod.
+
+    def __init__(self, spec, _shm=None):
+        name, self.width, self.height, self.start, self.goal = spec
+        self.spec = spec
+        if _shm is None:
+            _shm = shared_memory.SharedMemory(name=name)
+        self.__shm = _shm
+
+        ncells = (self.width + 2) * (self.height + 2)
+        buf = self.__shm.buf.toreadonly()
+        self.moves = buf[:ncells * 16].cast('i')
+        self.walls = buf[ncells * 16:ncells * 17]
+        self.__buf = buf
+
+    def scratch(self):
+        return bytearray(len(self.walls))
+
+    def __contains__(self, loc):
+        """True if loc inside maze, not on a border"""
+        x, y = loc
+        return (x > 0 and x < self.width + 1 and
+                y > 0 and y < self.height + 1)
+
+    def cell_id(self, location):
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        return x * (self.height + 2) + y
+
+    def location(self, cid):
+        return divmod(cid, self.height + 2)
+
+    def move_id(self, cid, code):
+        return self.moves[cid * 4 + code]
+
+    def simulate_move(self, location, direction):
+        code = maze.DIR_CODES.get(direction[0].lower())
+        if code is None:
+            return location
+        return self.location(self.moves[self.cell_id(location) * 4 + code])
+
+    def possible_moves(self, location, visited):
+        cid = self.cell_id(location)
+        moves = []
+        for code in (maze.NORTH, maze.SOUTH, maze.EAST, maze.WEST):
+            nid = self.moves[cid * 4 + code]
+            if nid != cid and not visited[nid]:
+                moves.append(maze.DIRECTIONS[code])
+        return moves
+
+    def close(self):
+        self.moves.release()
+        self.walls.release()
+        self.__buf.release()
+        self.__shm.close()
+
+    def unlink(self):
+        self.__shm.unlink()
+
+
+def publish(my_map):
+    """Compiles the Maze my_map into a new block of shared memory and
+       returns the publisher's SharedMaze for it"""
+    masks = my_map.wall_masks()
+    table = array('i', my_map.moves)
+    assert table.itemsize == 4
+
+    shm = shared_memory.SharedMemory(create=True, size=len(masks) * 17)
+    shm.buf[:len(masks) * 16] = memoryview(table).cast('B')
+    shm.buf[len(masks) * 16:len(masks) * 17] = masks
+
+    spec = (shm.name, my_map.width, my_map.height, my_map.start, my_map.goal)
+    return SharedMaze(spec, shm)
+
+
+# Worker-side state for main's demonstration.  Each worker attaches
+# once and then runs many queries against the same shared maze.
+_shared = None
+
+def _attach(spec):
+    global _shared
+    _shared = SharedMaze(spec)
+
+def _reachable(start):
+    # Count the cells reachable from start, using per-query scratch
+    visited = _shared.scratch()
+    sid = _shared.cell_id(start)
+    visited[sid] = 1
+    todo = [sid]
+    count = 0
+    while todo:
+        cid = todo.pop()
+        count += 1
+        for code in range(4):
+            nid = _shared.move_id(cid, code)
+            if not visited[nid]:
+                visited[nid] = 1
+                todo.append(nid)
+    return count
+
+def main():
+    # Just a testing routine
+    from city import CitySqGrid
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f'\nPublishing a {size}x{size} city')
+    city = CitySqGrid(size)
+    shared = publish(city)
+    try:
+        starts = [city.start, (1, 2), (2, 1), (2 * size - 1, 2 * size - 2)]
+        with multiprocessing.Pool(4, _attach, (shared.spec,)) as pool:
+            for start, count in zip(starts, pool.map(_reachable, starts)):
+                print(f'{count} cells reachable from {start}')
+        print(f'simulate_move({city.start}, "n") = '
+              f'{shared.simulate_move(city.start, "n")}')
+    finally:
+        shared.close()
+        shared.unlink()
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,37 @@
 ### chap11/sim.py -- Self-avoiding random walk simulation
 import sys
 from city import CitySqGrid
+import profiling
 from dogwalk import dogwalk, Cosmo
 
-def sim(blocks, trials, verbose):
+def sim(blocks, trials, verbose, prof=None):
+    if prof is None:
+        prof = profiling.PhaseTimer()
+
     # Initialize the metric of interest
     dead_ends = 0
 
     # Build the specified city
-    my_city = CitySqGrid(blocks, Cosmo)
+    with prof.phase('build'):
+        my_city = CitySqGrid(blocks, Cosmo)
     if verbose:
-        print(f'\nBuilding a {blocks}x{blocks} city')
-        print(my_city)
+        with prof.phase('render'):
+            print(f'\nBuilding a {blocks}x{blocks} city')
+            print(my_city)
 
     for _ in range(trials):
         # Reset the city before each trial
-        my_city.reset()
+        with prof.phase('reset'):
+            my_city.reset()
 
         # Run, record, and print the trial
-        success = dogwalk(my_city)
+        with prof.phase('walk'):
+            success = dogwalk(my_city)
         if not success:
             dead_ends += 1
         if verbose:
-            print(my_city)
+            with prof.phase('render'):
+                print(my_city)
 
     # Print the percentage of trials ending in dead ends
     print(f'{100 * dead_ends // trials}% dead ends')
@@ -30,17 +39,20 @@ def sim(blocks, trials, verbose):
 def main():
     # Execution defaults
     verbose = False
+    prof = profiling.Profile(sys.argv)   # takes --profile[=PATH]
 
     if len(sys.argv) == 4:
         verbose = True   # Anything in the verbose field works
     elif len(sys.argv) != 3:
-        sys.exit("Usage: python3 sim.py blocks trials [verbose]")
+        sys.exit("Usage: python3 sim.py [--profile[=PATH]] "
+                 "blocks trials [verbose]")
 
     # Process the remaining command line arguments
     blocks = int(sys.argv[1])  # on a side of the square grid; try 4
     trials = int(sys.argv[2])  # number of simulation runs; try 20
 
-    sim(blocks, trials, verbose)
+    sim(blocks, trials, verbose, prof)
+    prof.finish()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
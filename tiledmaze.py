@@ -0,0 +1,216 @@
+### chap11/tiledmaze.py -- A maze whose walls stay on disk until needed
+import sys
+import struct
+from collections import OrderedDict
+import maze
+
+# File layout: a header followed by square tiles of wall masks.  Each
+# tile holds TILE x TILE cells of the full grid (borders included), one
+# byte per cell in the 4-bit encoding used by maze.py, stored row by
+# row from the tile's SW corner.  Tiles are stored row by row from the
+# grid's SW corner, and tiles on the north and east edges are padded
+# out to full size.
+MAGIC = b'TMZ1'
+HEADER = struct.Struct('<4s7i')   # magic, width, height, tile, start, goal
+
+WALL_BITS = (0x8, 0x4, 0x2, 0x1)  # indexed by maze direction code
+STEPS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def write_tiled(path, width, height, wall_at, endpts, tile=64):
+    """Writes a tiled maze file without ever holding the whole maze in
+       memory.  wall_at(x, y) returns the wall mask at grid location
+       (x, y), for every location including the borders.  endpts is a
+       (start, goal) pair of locations."""
+    start, goal = endpts
+    tiles_x = (width + 2 + tile - 1) // tile
+    tiles_y = (height + 2 + tile - 1) // tile
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, width, height, tile, *start, *goal))
+        for ty in range(tiles_y):
+            for tx in range(tiles_x):
+                data = bytearray(tile * tile)
+                for j in range(tile):
+                    y = ty * tile + j
+                    if y >= height + 2:
+                        break
+                    for i in range(tile):
+                        x = tx * tile + i
+                        if x >= width + 2:
+                            break
+                        data[j * tile + i] = wall_at(x, y)
+                f.write(data)
+
+def save(my_map, path, tile=64):
+    """Writes the Maze my_map out as a tiled maze file"""
+    masks = my_map.wall_masks()
+    h2 = my_map.height + 2
+    write_tiled(path, my_map.width, my_map.height,
+                lambda x, y: masks[x * h2 + y],
+                (my_map.start, my_map.goal), tile)
+
+
+class TiledMaze(object):
+    """Abstraction: A TiledMaze behaves like a Maze whose walls are read
+       from a tiled maze file one tile at a time, as moves reach them.
+       At most `max_tiles` tiles stay in memory.  Cell contents start
+       out blank (except start and goal) and only the cells you mark
+       take up any memory.
+
+       instance.[width, height, start, goal]: As in class Maze.
+
+       walls(location): Returns the location's 4-bit wall mask.
+
+       __contains__, mark, get_mark, reset, possible_moves, move, and
+       simulate_move work just like their Maze counterparts, so searches
+       and walks written for Maze run unchanged.
+
+       close(): Closes the maze file.
+    """
+    # Implementation details: self.__tiles is an LRU cache, kept in an
+    # OrderedDict from tile coordinates to that tile's bytes.  The
+    # sparse content overlay, self.__marks, maps locations to content;
+    # a location not in it holds a blank.
+
+    def __init__(self, path, max_tiles=256):
+        assert max_tiles > 0
+        self.__file = open(path, 'rb')
+        magic, self.width, self.height, self.__tile, sx, sy, gx, gy = \
+            HEADER.unpack(self.__file.read(HEADER.size))
+        assert magic == MAGIC, f'{path} is not a tiled maze file'
+        self.start = (sx, sy)
+        self.goal = (gx, gy)
+        self.__tiles_x = (self.width + 2 + self.__tile - 1) // self.__tile
+        self.__max_tiles = max_tiles
+        self.__tiles = OrderedDict()
+        self.__marks = {}
+        self.reset()
+
+    def __tile_data(self, tx, ty):
+        # Hidden helper that returns one tile, reading it if necessary
+        key = (tx, ty)
+        data = self.__tiles.get(key)
+        if data is not None:
+            self.__tiles.move_to_end(key)
+            return data
+
+        size = self.__tile * self.__tile
+        self.__file.seek(HEADER.size + (ty * self.__tiles_x + tx) * size)
+        data = self.__file.read(size)
+        self.__tiles[key] = data
+        if len(self.__tiles) > self.__max_tiles:
+            self.__tiles.popitem(last=False)
+        return data
+
+    def walls(self, location):
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        t = self.__tile
+        return self.__tile_data(x // t, y // t)[(y % t) * t + x % t]
+
+    def __contains__(self, loc):
+        """True if loc inside maze, not on a border"""
+        x, y = loc
+        return (x > 0 and x < self.width + 1 and
+                y > 0 and y < self.height + 1)
+
+    def mark(self, location, character):
+        """Given a location, put the character there
+           in the maze."""
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        if character == ' ':
+            self.__marks.pop(location, None)
+        else:
+            self.__marks[location] = character
+
+    def get_mark(self, location):
+        """Return the contents of the specified location in the maze"""
+        x, y = location
+        assert x >= 0 and x < self.width + 2, f'bad x in {location}'
+        assert y >= 0 and y < self.height + 2, f'bad y in {location}'
+        return self.__marks.get(location, ' ')
+
+    def reset(self):
+        """Resets all cell contents to their original state"""
+        self.__marks.clear()
+        if self.start != maze.NO_LOC:
+            self.mark(self.start, 's')
+        if self.goal != maze.NO_LOC:
+            self.mark(self.goal, 'g')
+
+    def __step(self, location, code):
+        # Hidden helper that returns the location reached by moving in
+        # direction `code`, or location itself if the move is blocked
+        x, y = location
+        if self.walls(location) & WALL_BITS[code]:
+            return location
+        dx, dy = STEPS[code]
+        x, y = x + dx, y + dy
+        if x < 0 or x > self.width + 1 or y < 0 or y > self.height + 1:
+            return location
+        return (x, y)
+
+    def possible_moves(self, location, visited_character):
+        """Given a location and the character that marks previously
+           visted locations, return a list of possible moves from
+           this location (i.e., ones that don't hit a wall or return
+           you to a previously visited location)."""
+        moves = []
+        for code in (maze.NORTH, maze.SOUTH, maze.EAST, maze.WEST):
+            loc = self.__step(location, code)
+            if loc != location and \
+               self.__marks.get(loc, ' ') != visited_character:
+                moves.append(maze.DIRECTIONS[code])
+        return moves
+
+    def move(self, location, direction, make_move=True):
+        """Given a location and a direction, return the location
+           corresponding to that move, as in Maze.move"""
+        code = maze.DIR_CODES.get(direction[0].lower())
+        if code is None:
+            new_loc = location
+        else:
+            new_loc = self.__step(location, code)
+
+        if make_move:
+            c = self.get_mark(location)
+            self.mark(location, ' ')
+            self.mark(new_loc, c)
+
+        return new_loc
+
+    def simulate_move(self, location, direction):
+        """Like move, but does NOT make the move"""
+        return self.move(location, direction, False)
+
+    def close(self):
+        self.__file.close()
+
+
+def main():
+    # Just a testing routine: tile a generated maze, then walk it
+    import os
+    import tempfile
+    import mazegen
+    import dogwalk
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    path = os.path.join(tempfile.mkdtemp(), 'city.tmz')
+
+    print(f'\nTiling a {size}x{size} city into {path}')
+    save(mazegen.city(size, size, seed=32), path, tile=32)
+    city = TiledMaze(path, max_tiles=16)
+    print(f'Its start is {city.start}; moves there are '
+          f'{city.possible_moves(city.start, dogwalk.EXPLORED)}')
+
+    success = dogwalk.dogwalk(city)
+    print(f'A random walk {"escaped" if success else "hit a dead end"}')
+    city.close()
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+### chap11/treenote.py -- The notes that record a search's tree of paths
+
+# Keep track of the tree of explored paths
+class TreeNote():
+    # A search can create one of these per frontier entry, so we use
+    # __slots__ to skip the per-object dictionary
+    __slots__ = ('state', 'parent', 'action')
+
+    def __init__(self, state, parent, action):
+        self.state = state    # current location 
+        self.parent = parent  # previous note in path
+        self.action = action  # action that got us to this location
@@ -1,7 +1,8 @@
 ### chap11/wander.py -- Wander through the city's highlights
-from maze import NO_LOC
 from city import CitySqGrid
-from pin import Pin, MAX_DISTANCE
+from pin import Pin
+from render import TermRenderer
+from distmap import DistanceMap
 
 # Our faithful dog
 Cosmo = '\N{DOG FACE}'
@@ -16,9 +17,16 @@ commands = [
     'q',  # quit
 ]
 
-def wander(my_city, pins):
+def wander(my_city, pins, screen=None):
+    if screen is None:
+        screen = TermRenderer(my_city)
+        screen.draw()
     cur_loc = my_city.start
 
+    # Walking distances to the highly-rated pins, computed once
+    dm = DistanceMap(my_city)
+    dm.add_category('good', [pin.loc for pin in pins if pin.stars >= 3])
+
     while cur_loc in my_city:    # wander only in the city
         answer = input('Where to? ')
         if answer == '':
@@ -33,32 +41,28 @@ def wander(my_city, pins):
             return
         
         elif cmd == 'c':
-            best_loc = NO_LOC            # not a valid location
-            best_distance = MAX_DISTANCE # bigger than any allowable map
-
-            # Find the closest highly-rated pin
-            for pin in pins:
-                dist = pin.distance(cur_loc)
-                if dist < best_distance:
-                    best_loc = pin.loc
-                    best_distance = dist
-
-            assert best_loc != NO_LOC, "Failed to find a pin"
-
-            # Teleport to within one step, which requires me to erase
-            # the character from the cur_loc.
+            # Find the open cell next to the closest highly-rated pin,
+            # counting steps around the buildings
+            best_loc = dm.nearest(cur_loc, 'good')
+            if best_loc is None:
+                print("No highly-rated pin is reachable from here")
+                continue
+
+            # Teleport there, which requires me to erase the character
+            # from the cur_loc.
             character = my_city.get_mark(cur_loc)
             my_city.mark(cur_loc, ' ')
-            cur_loc = (best_loc[0] - 1, best_loc[1] - 1)
+            cur_loc = best_loc
             my_city.mark(cur_loc, character)
-            direction = 'n'
+            screen.draw()
+            continue
 
         else:
             direction = cmd
 
         # Make the move and show the updated map
         cur_loc = my_city.move(cur_loc, direction)
-        print(my_city)
+        screen.draw()
 
 def main():
     # Build the city and put Cosmo at its center
@@ -74,9 +78,10 @@ def main():
     for pin in pins:
         nyc.mark(pin.loc, pin.icon)
 
-    print(nyc)
+    screen = TermRenderer(nyc)
+    screen.draw()
 
-    wander(nyc, pins)
+    wander(nyc, pins, screen)
 
     print('Thanks for the fun walk!')
 